@@ -0,0 +1,13 @@
+"""
+Put src/ on sys.path once per process.
+
+Entry points do `import _bootstrap` instead of rebuilding the path themselves;
+the module cache makes repeat imports free.
+"""
+
+import os
+import sys
+
+_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+if _SRC not in sys.path:
+    sys.path.insert(0, _SRC)
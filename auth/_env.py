@@ -0,0 +1,9 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def load_env():
+    """Parse .env once per process, no matter how many modules ask for it."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
@@ -0,0 +1,41 @@
+import math
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+
+def _default(obj):
+    """Serialize the numpy scalars and Timestamps found in trades/analysis."""
+    if hasattr(obj, "item"):  # numpy scalar
+        obj = obj.item()
+        return None if isinstance(obj, float) and not math.isfinite(obj) else obj
+    if isinstance(obj, datetime):  # includes pd.Timestamp
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _finite(obj):
+    """obj with NaN/inf floats replaced by None, as orjson writes them."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def dumps(obj) -> bytes:
+    """Indented UTF-8 JSON via orjson when installed; NaN/inf become null either way."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_finite(obj), indent=2, default=_default, allow_nan=False).encode("utf-8")
+
+
+def loads(data):
+    """Parse JSON bytes/str via orjson when installed."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
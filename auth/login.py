@@ -1,22 +1,49 @@
 import os
-from dotenv import load_dotenv
-from kiteconnect import KiteConnect
-from auth.token_manager import save_access_token
+from auth._env import load_env
+from auth.token_manager import load_access_token, save_access_token
 
-load_dotenv()
+load_env()
 API_KEY = os.getenv("API_KEY")
 API_SECRET = os.getenv("API_SECRET")
 
-if not API_KEY or not API_SECRET:
-    raise SystemExit("Please set API_KEY and API_SECRET in your .env")
+def login(force: bool = False):
+    """
+    Return an authenticated KiteConnect client.
 
-kite = KiteConnect(api_key=API_KEY)
-print("Login URL:")
-print(kite.login_url())
+    Reuses the saved access token when it is still accepted by Kite and only
+    falls back to the interactive request_token flow when it is missing,
+    expired, or force=True.
+    """
+    if not API_KEY or not API_SECRET:
+        raise SystemExit("Please set API_KEY and API_SECRET in your .env")
 
-request_token = input("Paste request_token from redirect URL: ").strip()
-data = kite.generate_session(request_token, api_secret=API_SECRET)
-access_token = data["access_token"]
-kite.set_access_token(access_token)
-save_access_token(access_token)
-print("✅ Access token saved to auth/access_token.json")
+    from kiteconnect import KiteConnect
+    from kiteconnect.exceptions import TokenException
+
+    kite = KiteConnect(api_key=API_KEY)
+
+    if not force:
+        cached_token = load_access_token()
+        if cached_token:
+            kite.set_access_token(cached_token)
+            try:
+                kite.profile()
+                print("✅ Reusing saved access token")
+                return kite
+            except TokenException:
+                print("⚠️  Saved access token expired, logging in again")
+
+    print("Login URL:")
+    print(kite.login_url())
+
+    request_token = input("Paste request_token from redirect URL: ").strip()
+    data = kite.generate_session(request_token, api_secret=API_SECRET)
+    access_token = data["access_token"]
+    kite.set_access_token(access_token)
+    save_access_token(access_token)
+    print("✅ Access token saved to auth/access_token.json")
+    return kite
+
+if __name__ == "__main__":
+    import sys
+    login(force="--force" in sys.argv[1:])
@@ -1,25 +1,36 @@
-import json
 import os
 from datetime import datetime
-from dotenv import load_dotenv
+from auth._env import load_env
+from auth._json import dumps, loads
 
-load_dotenv()
+load_env()
 
 TOKEN_PATH = os.path.join(os.path.dirname(__file__), "access_token.json")
 
+# (st_mtime_ns, token) of the last successful read of TOKEN_PATH
+_TOKEN_CACHE: tuple[int, str | None] | None = None
+
 def save_access_token(access_token: str):
     os.makedirs(os.path.dirname(TOKEN_PATH), exist_ok=True)
     payload = {"access_token": access_token, "saved_at": datetime.now().isoformat()}
-    with open(TOKEN_PATH, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
+    with open(TOKEN_PATH, "wb") as f:
+        f.write(dumps(payload))
     return TOKEN_PATH
 
 def load_access_token() -> str | None:
-    if not os.path.exists(TOKEN_PATH):
+    global _TOKEN_CACHE
+    try:
+        st = os.stat(TOKEN_PATH)
+    except FileNotFoundError:
         return None
+    # Re-parse only when the file has been rewritten since the last read
+    if _TOKEN_CACHE is not None and _TOKEN_CACHE[0] == st.st_mtime_ns:
+        return _TOKEN_CACHE[1]
     try:
-        with open(TOKEN_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("access_token")
+        with open(TOKEN_PATH, "rb") as f:
+            data = loads(f.read())
+        token = data.get("access_token")
     except Exception:
         return None
+    _TOKEN_CACHE = (st.st_mtime_ns, token)
+    return token
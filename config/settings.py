@@ -3,6 +3,7 @@ Main settings configuration for the Kite Trading Bot.
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
 
 # Project root directory
@@ -59,6 +60,13 @@ TRADING_END_TIME = "14:00"
 MARKET_OPEN_TIME = "09:15"
 MARKET_CLOSE_TIME = "15:30"
 
+# NSE weekday trading holidays (exchange circular); extend each calendar year
+NSE_HOLIDAYS = [
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14",
+    "2025-04-18", "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02",
+    "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
+]
+
 # Logging settings
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -79,7 +87,9 @@ ENV_EXAMPLE_FILE = PROJECT_ROOT / "env.example"
 REQUIREMENTS_FILE = PROJECT_ROOT / "requirements.txt"
 README_FILE = PROJECT_ROOT / "README.md"
 
-# Create directories if they don't exist
-for directory in [DATA_DIR, RAW_DATA_DIR, PROCESSED_DATA_DIR, RESULTS_DIR, 
-                  REPORTS_DIR, AUTH_DIR, PROJECT_ROOT / "logs"]:
-    directory.mkdir(parents=True, exist_ok=True)
+@lru_cache(maxsize=1)
+def ensure_dirs():
+    """Create project directories if they don't exist (once per process)."""
+    for directory in [DATA_DIR, RAW_DATA_DIR, PROCESSED_DATA_DIR, RESULTS_DIR, 
+                      REPORTS_DIR, AUTH_DIR, PROJECT_ROOT / "logs"]:
+        directory.mkdir(parents=True, exist_ok=True)
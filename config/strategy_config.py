@@ -2,6 +2,8 @@
 Strategy-specific configuration settings.
 """
 
+from types import MappingProxyType
+
 # Strategy V3 Configuration
 V3_CONFIG = {
     "name": "Floating Band Strategy V3.0",
@@ -142,16 +144,27 @@ ORIGINAL_CONFIG = {
     }
 }
 
-# Strategy registry
-STRATEGY_REGISTRY = {
+def _freeze(d):
+    """Return a read-only view of a (nested) config dict."""
+    return MappingProxyType({k: _freeze(v) if isinstance(v, dict) else v for k, v in d.items()})
+
+# Strategy registry (read-only: callers share these without defensive copies)
+STRATEGY_REGISTRY = _freeze({
     "original": ORIGINAL_CONFIG,
     "v2": V2_CONFIG,
     "v3": V3_CONFIG
-}
+})
+
+# Lookup table resolved once at import: exact names hit without allocating a
+# case-folded copy of the key, other spellings fall back to str.casefold().
+_CONFIG_LOOKUP = {name.casefold(): config for name, config in STRATEGY_REGISTRY.items()}
 
 def get_strategy_config(strategy_name: str):
     """Get configuration for a specific strategy."""
-    return STRATEGY_REGISTRY.get(strategy_name.lower(), V3_CONFIG)
+    config = _CONFIG_LOOKUP.get(strategy_name)
+    if config is None:
+        config = _CONFIG_LOOKUP.get(strategy_name.casefold(), STRATEGY_REGISTRY["v3"])
+    return config
 
 def get_available_strategies():
     """Get list of available strategies."""
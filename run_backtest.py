@@ -5,10 +5,8 @@ This script provides easy access to run backtests from the root directory.
 """
 
 import sys
-from pathlib import Path
 
-# Add src to path
-sys.path.append(str(Path(__file__).parent / "src"))
+import _bootstrap  # noqa: F401  sets up sys.path
 
 def main():
     """Main function to run backtest."""
@@ -16,6 +14,9 @@ def main():
     print("=" * 40)
     
     try:
+        from config.settings import ensure_dirs
+        ensure_dirs()
+        
         # Import and run the backtest engine
         from backtesting.engine import main
         
@@ -5,10 +5,8 @@ This script allows you to choose which strategy to run.
 """
 
 import sys
-from pathlib import Path
 
-# Add src to path
-sys.path.append(str(Path(__file__).parent / "src"))
+import _bootstrap  # noqa: F401  sets up sys.path
 
 def show_strategy_menu():
     """Show available strategies menu."""
@@ -30,18 +28,6 @@ def run_original_strategy():
     from backtesting.engine import main
     main()
 
-def run_original_strategy():
-    """Run the original strategy."""
-    print("📊 Running Original Strategy...")
-    print("📈 Strategy: Floating Band UB/LB")
-    print("⏰ Timeframe: 5minute")
-    print("📊 Instrument: BankNifty Weekly Futures")
-    print("-" * 40)
-    
-    from backtesting.engine import main
-    main()
-
-
 
 def main():
     """Main function to select and run strategy."""
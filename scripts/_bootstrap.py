@@ -0,0 +1,14 @@
+"""
+Put the repo root and src/ on sys.path once per process.
+
+Scripts in this folder run with scripts/ as sys.path[0], so the root
+_bootstrap.py is not importable from here; this is its counterpart.
+"""
+
+import os
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _path in (_ROOT, os.path.join(_ROOT, "src")):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
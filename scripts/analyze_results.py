@@ -5,55 +5,81 @@ Script to analyze backtest results for the Kite Trading Bot.
 
 import sys
 import argparse
-import pandas as pd
+import calendar
 from pathlib import Path
 from datetime import datetime
 
-# Add src to path
-sys.path.append(str(Path(__file__).parent.parent / "src"))
+import _bootstrap  # noqa: F401  sets up sys.path
 
-from strategies.analysis.optimizer import analyze_performance_patterns
-from strategies.analysis.comparator import analyze_strategy_comparison
-from strategies.analysis.v3_validator import simulate_v3_performance_on_july_august
 from config.settings import RESULTS_DIR, REPORTS_DIR
 
+DEFAULT_RESULTS_CSV = RESULTS_DIR / "jan_to_august_trades.csv"
+TABLE_COLUMNS = {'sum': 'points', 'count': 'trades', 'mean': 'avg'}
+
+ANALYSES = {
+    "performance": "P&L summary with day-of-week and monthly breakdown",
+    "comparison": "Strategy comparison analysis",
+    "v3-validation": "V3 validation analysis",
+    "optimization": "Optimization analysis",
+}
+
 def main():
-    parser = argparse.ArgumentParser(description="Analyze backtest results")
-    parser.add_argument("--analysis-type", "-t",
-                       choices=["performance", "comparison", "v3-validation", "optimization"],
-                       default="performance",
-                       help="Type of analysis to run")
-    parser.add_argument("--input-file", "-i",
+    # Shared options, accepted before or after the subcommand. SUPPRESS keeps a
+    # subcommand from resetting values given before it; defaults are seeded
+    # into the namespace passed to parse_args
+    common = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    common.add_argument("--input-file", "-i",
                        help="Input file with results")
-    parser.add_argument("--output-file", "-o",
+    common.add_argument("--output-file", "-o",
                        help="Output file for analysis")
-    parser.add_argument("--strategy", "-s",
+    common.add_argument("--strategy", "-s",
                        choices=["original", "v2", "v3"],
                        help="Strategy to analyze")
-    parser.add_argument("--period", "-p",
+    common.add_argument("--period", "-p",
                        choices=["july-august", "jan-aug", "all"],
-                       default="all",
-                       help="Time period to analyze")
+                       help="Time period to analyze (default: all)")
+    
+    parser = argparse.ArgumentParser(description="Analyze backtest results", parents=[common])
+    parser.add_argument("--analysis-type", "-t",
+                       choices=list(ANALYSES),
+                       help="Type of analysis to run (same as the ANALYSIS subcommand)")
+    
+    # Each handler imports pandas/analysis modules itself, so --help stays light
+    sub = parser.add_subparsers(dest="cmd", metavar="ANALYSIS",
+                                help="Type of analysis to run (default: performance)")
+    for name, help_text in ANALYSES.items():
+        sub.add_parser(name, parents=[common], help=help_text)
     
-    args = parser.parse_args()
+    args = parser.parse_args(namespace=argparse.Namespace(
+        input_file=None, output_file=None, strategy=None, period="all"))
+    args.cmd = args.cmd or args.analysis_type or "performance"
+    handler = {
+        "performance": run_performance_analysis,
+        "comparison": run_comparison_analysis,
+        "v3-validation": run_v3_validation,
+        "optimization": run_optimization_analysis,
+    }[args.cmd]
     
-    print(f"🔍 Running {args.analysis_type} analysis")
+    print(f"🔍 Running {args.cmd} analysis")
     print("-" * 40)
     
     try:
-        if args.analysis_type == "performance":
-            run_performance_analysis(args)
-        elif args.analysis_type == "comparison":
-            run_comparison_analysis(args)
-        elif args.analysis_type == "v3-validation":
-            run_v3_validation(args)
-        elif args.analysis_type == "optimization":
-            run_optimization_analysis(args)
+        handler(args)
             
     except Exception as e:
         print(f"❌ Error running analysis: {e}")
         sys.exit(1)
 
+def _load_results(path):
+    """Parse a trades CSV (dates parsed, day_of_week as an ordered categorical)."""
+    import pandas as pd
+    from strategies.analysis.common import DAY_OF_WEEK_DTYPE
+    
+    df = pd.read_csv(path, parse_dates=['date'], dtype={'pnl': 'float64'})
+    # int8 category codes: cheap groupby keys and a fixed Monday..Friday order
+    df['day_of_week'] = df['day_of_week'].astype(DAY_OF_WEEK_DTYPE)
+    return df
+
 def run_performance_analysis(args):
     """Run performance analysis on results."""
     print("📊 Running performance analysis...")
@@ -62,26 +88,38 @@ def run_performance_analysis(args):
     if args.input_file:
         data_file = Path(args.input_file)
     else:
-        data_file = RESULTS_DIR / "jan_to_august_trades.csv"
+        data_file = DEFAULT_RESULTS_CSV
     
     if not data_file.exists():
         print(f"❌ Results file not found: {data_file}")
         return
     
+    import numpy as np
+    
     # Run analysis
-    df = pd.read_csv(data_file)
-    df['date'] = pd.to_datetime(df['date'])
+    df = _load_results(data_file)
+    
+    # Materialise pnl and month codes once; every mask below is derived from them
+    pnl = df['pnl'].to_numpy(dtype=np.float64)
+    month_codes = df['date'].dt.month.to_numpy(dtype=np.int8)
     
     # Filter by period if specified
     if args.period == "july-august":
-        df = df[(df['date'].dt.month == 7) | (df['date'].dt.month == 8)]
+        period_mask = np.isin(month_codes, np.array([7, 8], dtype=np.int8))
     elif args.period == "jan-aug":
-        df = df[(df['date'].dt.month >= 1) & (df['date'].dt.month <= 8)]
+        period_mask = (month_codes >= 1) & (month_codes <= 8)
+    else:
+        period_mask = None
+    
+    if period_mask is not None:
+        df = df[period_mask]
+        pnl = pnl[period_mask]
+        month_codes = month_codes[period_mask]
     
     # Calculate performance metrics
-    total_pnl = df['pnl'].sum()
-    total_trades = len(df)
-    winning_trades = len(df[df['pnl'] > 0])
+    total_pnl = pnl.sum()
+    total_trades = len(pnl)
+    winning_trades = int(np.count_nonzero(pnl > 0))
     win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
     
     print(f"\n📈 PERFORMANCE SUMMARY:")
@@ -95,17 +133,16 @@ def run_performance_analysis(args):
     # Day of week analysis
     print(f"\n📅 DAY OF WEEK ANALYSIS:")
     print("-" * 25)
-    day_analysis = df.groupby('day_of_week')['pnl'].agg(['sum', 'count', 'mean']).round(2)
-    for day, data in day_analysis.iterrows():
-        print(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})")
+    day_analysis = df.groupby('day_of_week', observed=True)['pnl'].agg(['sum', 'count', 'mean']).round(2)
+    print(day_analysis.rename(columns=TABLE_COLUMNS).to_string(float_format=lambda x: f"{x:>8.2f}"))
     
     # Monthly analysis
     print(f"\n📅 MONTHLY ANALYSIS:")
     print("-" * 20)
-    df['month'] = df['date'].dt.strftime('%B')
-    monthly_analysis = df.groupby('month')['pnl'].agg(['sum', 'count']).round(2)
-    for month, data in monthly_analysis.iterrows():
-        print(f"{month}: {data['sum']:>8.2f} points ({data['count']:>2} trades)")
+    # Group on integer month codes and only format the handful of labels
+    monthly_analysis = df['pnl'].groupby(month_codes).agg(['sum', 'count']).round(2)
+    monthly_analysis.index = [calendar.month_name[m] for m in monthly_analysis.index]
+    print(monthly_analysis.rename(columns=TABLE_COLUMNS).to_string(float_format=lambda x: f"{x:>8.2f}"))
 
 def run_comparison_analysis(args):
     """Run strategy comparison analysis."""
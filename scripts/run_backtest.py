@@ -5,15 +5,11 @@ Script to run backtests for the Kite Trading Bot.
 
 import sys
 import argparse
-from pathlib import Path
 from datetime import datetime
 
-# Add src to path
-sys.path.append(str(Path(__file__).parent.parent / "src"))
+import _bootstrap  # noqa: F401  sets up sys.path
 
-from backtesting.engine import run_backtest
-from strategies.core import original, v2, v3
-from config.settings import DEFAULT_START_DATE, DEFAULT_END_DATE, DEFAULT_STRATEGY
+from config.settings import DEFAULT_START_DATE, DEFAULT_END_DATE, DEFAULT_STRATEGY, ensure_dirs
 from config.strategy_config import get_strategy_config, get_available_strategies
 
 def main():
@@ -42,6 +38,11 @@ def main():
                        help="Verbose output")
     
     args = parser.parse_args()
+    ensure_dirs()
+    
+    # Heavy imports (pandas, kiteconnect) are deferred so --help stays fast
+    from backtesting.engine import run_backtest
+    from strategies.core import original, v2, v3
     
     print(f"🚀 Running backtest for {args.strategy.upper()} strategy")
     print(f"📅 Period: {args.start_date} to {args.end_date}")
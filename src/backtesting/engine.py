@@ -1,21 +1,29 @@
 import os
-from dotenv import load_dotenv
+from collections import namedtuple
+from functools import lru_cache
 from kiteconnect import KiteConnect
+import numpy as np
 import pandas as pd
 from datetime import datetime
-import sys
-from pathlib import Path
-
-# Add parent directories to path for imports
-sys.path.append(str(Path(__file__).parent.parent.parent))
 
+# Import paths (repo root + src/) are set up once by the entry point's _bootstrap
+from auth._env import load_env
 from auth.token_manager import load_access_token
-from utils.instruments import download_instruments_csv, get_banknifty_weekly_fut_token
+from utils.instruments import get_instruments_cached, get_banknifty_weekly_fut_token
 from utils.data_fetch import fetch_5min_data
 # Import the original strategy functions
-from src.strategies.core.original import run_floating_band_strategy, save_strategy_report
+from strategies.core.original import run_floating_band_strategy, save_strategy_report
+
+Settings = namedtuple("Settings", ["api_key", "access_token"])
 
-load_dotenv()
+@lru_cache(maxsize=1)
+def get_settings():
+    """API key and access token, read once per process."""
+    load_env()
+    return Settings(
+        api_key=os.getenv("API_KEY"),
+        access_token=(load_access_token() or "").strip(),
+    )
 
 def print_trade_summary(trades):
     """Print detailed trade summary with enhanced formatting."""
@@ -28,53 +36,36 @@ def print_trade_summary(trades):
     print(f"{'#':>2} {'Entry Time':>8} {'Side':>5} {'Entry':>7} {'Exit Time':>8} {'Exit':>7} {'P&L':>8} {'Reason':>15}")
     print("-" * 85)
     
-    total_pnl = 0
-    winning_trades = 0
-    losing_trades = 0
-    max_profit = float('-inf')
-    max_loss = float('inf')
-    
-    for i, trade in enumerate(trades, 1):
-        pnl = trade['pnl']
-        total_pnl += pnl
-        
-        if pnl > 0:
-            winning_trades += 1
-            pnl_symbol = "✅"
-            max_profit = max(max_profit, pnl)
-        else:
-            losing_trades += 1
-            pnl_symbol = "❌"
-            max_loss = min(max_loss, pnl)
-        
-        # Format times to show only HH:MM
-        entry_time = trade['entry_time']
-        exit_time = trade['exit_time']
-        
-        if hasattr(entry_time, 'strftime'):
-            entry_str = entry_time.strftime("%H:%M")
-        else:
-            entry_str = str(entry_time)[:5] if len(str(entry_time)) >= 5 else str(entry_time)
-            
-        if hasattr(exit_time, 'strftime'):
-            exit_str = exit_time.strftime("%H:%M")
-        else:
-            exit_str = str(exit_time)[:5] if len(str(exit_time)) >= 5 else str(exit_time)
-            
-        print(f"{i:2d} {entry_str:>8} {trade['side']:>5} {trade['entry_price']:7.2f} "
-              f"{exit_str:>8} {trade['exit_price']:7.2f} "
-              f"{pnl_symbol}{pnl:+6.2f} {trade['reason']:>15}")
+    # All P&L stats come from one array; the table below only formats rows
+    pnls = np.fromiter((t['pnl'] for t in trades), dtype=np.float64, count=len(trades))
+    wins = pnls > 0
+    symbols = np.where(wins, "✅", "❌")
+    # Normalise times once and format the whole column to HH:MM in one call
+    entry_strs = pd.to_datetime([t['entry_time'] for t in trades]).strftime("%H:%M")
+    exit_strs = pd.to_datetime([t['exit_time'] for t in trades]).strftime("%H:%M")
+    total_pnl = pnls.sum()
+    winning_trades = int(np.count_nonzero(wins))
+    losing_trades = len(trades) - winning_trades
+    max_profit = pnls[wins].max() if winning_trades else None
+    max_loss = pnls[~wins].min() if losing_trades else None
+    
+    # Build the whole table first and emit it with a single print
+    lines = [
+        f"{i:2d} {entry_strs[i - 1]:>8} {trade['side']:>5} {trade['entry_price']:7.2f} "
+        f"{exit_strs[i - 1]:>8} {trade['exit_price']:7.2f} "
+        f"{symbols[i - 1]}{trade['pnl']:+6.2f} {trade['reason']:>15}"
+        for i, trade in enumerate(trades, 1)
+    ]
+    print("\n".join(lines))
     
     print("-" * 85)
-    win_rate = (winning_trades / len(trades)) * 100 if trades else 0
-    avg_profit = max_profit if max_profit != float('-inf') else 0
-    avg_loss = max_loss if max_loss != float('inf') else 0
+    win_rate = (winning_trades / len(trades)) * 100
     
     print(f"💰 Total P&L: {total_pnl:+8.2f}")
     print(f"📈 Win Rate:  {win_rate:7.1f}% ({winning_trades}W/{losing_trades}L)")
-    if max_profit != float('-inf'):
+    if max_profit is not None:
         print(f"🟢 Best Trade: {max_profit:+7.2f}")
-    if max_loss != float('inf'):
+    if max_loss is not None:
         print(f"🔴 Worst Trade: {max_loss:+6.2f}")
     print("=" * 85)
 
@@ -88,16 +79,16 @@ def validate_data(df):
     if missing:
         raise ValueError(f"❌ Missing required columns: {missing}")
     
-    # Check for valid OHLC data
-    invalid_rows = df[(df['high'] < df['low']) | 
-                      (df['high'] < df['open']) | 
-                      (df['high'] < df['close']) | 
-                      (df['low'] > df['open']) | 
-                      (df['low'] > df['close'])].index
+    # Check for valid OHLC data directly on the raw price arrays
+    o = df['open'].to_numpy()
+    h = df['high'].to_numpy()
+    l = df['low'].to_numpy()
+    c = df['close'].to_numpy()
+    invalid = (h < l) | (h < o) | (h < c) | (l > o) | (l > c)
     
-    if len(invalid_rows) > 0:
-        print(f"⚠️  Warning: Found {len(invalid_rows)} invalid OHLC rows, cleaning...")
-        df = df.drop(invalid_rows).reset_index(drop=True)
+    if invalid.any():
+        print(f"⚠️  Warning: Found {int(np.count_nonzero(invalid))} invalid OHLC rows, cleaning...")
+        df = df.loc[~invalid].reset_index(drop=True)
     
     print(f"✅ Data validation passed: {len(df)} valid candles")
     print(f"   Time range: {df['time'].min()} to {df['time'].max()}")
@@ -108,8 +99,10 @@ def validate_data(df):
 def prepare_time_column(df):
     """Standardize time column format for better readability."""
     if "time" in df.columns:
-        # Convert to datetime if not already
-        df["time"] = pd.to_datetime(df["time"], errors="coerce")
+        # Convert to datetime if not already; Kite timestamps are ISO 8601,
+        # so skip per-element format inference
+        if not pd.api.types.is_datetime64_any_dtype(df["time"]):
+            df["time"] = pd.to_datetime(df["time"], format="ISO8601", cache=True, errors="coerce")
         
         # Remove timezone info if present
         if df["time"].dt.tz is not None:
@@ -122,23 +115,15 @@ def calculate_avg_trade_duration(trades):
     if not trades:
         return "N/A"
     
-    total_minutes = 0
-    valid_trades = 0
-    
-    for trade in trades:
-        try:
-            entry = trade['entry_time']
-            exit = trade['exit_time']
-            
-            if hasattr(entry, 'timestamp') and hasattr(exit, 'timestamp'):
-                duration = (exit - entry).total_seconds() / 60
-                total_minutes += duration
-                valid_trades += 1
-        except:
-            continue
+    # One vectorised datetime diff; unparseable times become NaT and are skipped
+    entries = pd.to_datetime([t['entry_time'] for t in trades], errors='coerce')
+    exits = pd.to_datetime([t['exit_time'] for t in trades], errors='coerce')
+    minutes = (exits - entries).total_seconds().to_numpy() / 60
+    minutes = minutes[~np.isnan(minutes)]
+    valid_trades = len(minutes)
     
     if valid_trades > 0:
-        avg_minutes = total_minutes / valid_trades
+        avg_minutes = minutes.mean()
         if avg_minutes >= 60:
             return f"{avg_minutes/60:.1f} hours"
         else:
@@ -153,11 +138,10 @@ def display_strategy_preview(df):
     print("-" * 80)
     
     # Show first few rows with proper formatting
-    for i in range(min(5, len(df))):
-        time_str = df.loc[i, 'time'].strftime("%H:%M") if hasattr(df.loc[i, 'time'], 'strftime') else str(df.loc[i, 'time'])[:5]
-        volume = df.loc[i, 'volume'] if 'volume' in df.columns else 0
-        high = df.loc[i, 'high']
-        low = df.loc[i, 'low']
+    head = df.head(5)
+    volumes = head['volume'] if 'volume' in head.columns else [0] * len(head)
+    for i, (time_val, volume, high, low) in enumerate(zip(head['time'], volumes, head['high'], head['low'])):
+        time_str = time_val.strftime("%H:%M") if hasattr(time_val, 'strftime') else str(time_val)[:5]
         range_val = high - low
         ub = high + range_val
         lb = low - range_val
@@ -170,24 +154,21 @@ def main():
     print("🚀 Starting Original Floating Band UB/LB Strategy")
     print("=" * 60)
     
-    # Load environment variables
-    api_key = os.getenv("API_KEY")
-    if not api_key:
+    # Load API key and access token
+    settings = get_settings()
+    if not settings.api_key:
         raise SystemExit("❌ Set API_KEY in .env file")
-    
-    # Load access token
-    access_token = (load_access_token() or "").strip()
-    if not access_token:
+    if not settings.access_token:
         raise SystemExit("❌ Run auth/login.py to generate today's access token")
 
     # Initialize KiteConnect
-    kite = KiteConnect(api_key=api_key)
-    kite.set_access_token(access_token)
+    kite = KiteConnect(api_key=settings.api_key)
+    kite.set_access_token(settings.access_token)
 
     try:
         # Download instruments and get BANKNIFTY Weekly token
-        print("📥 Downloading instruments dump...")
-        df_inst = download_instruments_csv()
+        print("📥 Loading instruments dump...")
+        df_inst = get_instruments_cached()
         token = get_banknifty_weekly_fut_token(df_inst)
         
         if not token:
@@ -231,7 +212,10 @@ def main():
         
         # Additional statistics
         if trades:
-            signals_count = len(annotated[annotated['Signal'] != ''])
+            # One non-empty mask shared by the signal count and the breakdown
+            sig = annotated['Signal']
+            nonempty = sig.ne('') & sig.notna()
+            signals_count = int(nonempty.sum())
             print(f"\n📈 Strategy Performance Summary:")
             print(f"   Analysis Date: {target_date}")
             print(f"   Candles Processed: {len(df)}")
@@ -240,12 +224,11 @@ def main():
             print(f"   Average Trade Duration: {calculate_avg_trade_duration(trades)}")
             
             # Signal breakdown
-            signal_counts = annotated['Signal'].value_counts()
+            signal_counts = sig[nonempty].value_counts()
             if len(signal_counts) > 0:
                 print(f"\n🎯 Signal Breakdown:")
                 for signal, count in signal_counts.items():
-                    if signal and signal.strip():
-                        print(f"   {signal}: {count}")
+                    print(f"   {signal}: {count}")
         else:
             print(f"\n📊 Analysis Summary for {target_date}:")
             print(f"   Candles Processed: {len(df)}")
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Trading weekdays as an ordered categorical (int8 codes instead of strings)
+DAY_OF_WEEK_DTYPE = pd.CategoricalDtype(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'], ordered=True)
+
+# V2 position size per weekday; days not listed trade at full size
+V2_DAY_SIZING = {'Monday': 0.7, 'Tuesday': 0.5, 'Friday': 0.8}
+
+# Per-trade V2 results, written by the V2 validator and read back by the
+# optimizer and the V3 validator. The pickle is the typed frame load_v2_data
+# would otherwise rebuild from the CSV
+V2_CSV = 'results/v2_real_data_analysis.csv'
+V2_CACHE = 'results/v2_real_data_analysis.pkl'
+
+def load_v2_data():
+    """Load the V2 real-data analysis (date parsed), via the pickle cache"""
+    try:
+        csv_mtime = os.stat(V2_CSV).st_mtime
+    except FileNotFoundError:
+        print("❌ V2 analysis data not found. Please run V2 analysis first.")
+        return None
+    
+    # Reuse the parsed (typed) frame from a previous run unless the CSV has changed since
+    if os.path.exists(V2_CACHE) and os.stat(V2_CACHE).st_mtime >= csv_mtime:
+        return pd.read_pickle(V2_CACHE)
+    
+    df = pd.read_csv(V2_CSV)
+    df['date'] = pd.to_datetime(df['date'])
+    df['day_of_week'] = df['day_of_week'].astype(DAY_OF_WEEK_DTYPE)
+    df.to_pickle(V2_CACHE)
+    return df
+
+def simulate_sized_pnl(pnl, day_codes, date_codes, sizing, stop_loss, daily_limit=None,
+                       stop_after_sizing=False):
+    """
+    Day-of-week sizing plus per-trade stop-loss clip over flat P&L arrays,
+    then scale each day whose total breaches daily_limit back to exactly
+    -daily_limit (skipped when daily_limit is None). sizing maps weekday ->
+    multiplier (unlisted days trade at 1.0); day_codes are DAY_OF_WEEK_DTYPE
+    codes, date_codes are 0..D-1. The stop applies to the unsized P&L unless
+    stop_after_sizing. Returns (sized P&L, final P&L after the cap).
+    """
+    # sizing indexed by category code; the trailing 1.0 catches code -1
+    size_by_code = np.array([sizing.get(d, 1.0) for d in DAY_OF_WEEK_DTYPE.categories] + [1.0])
+    if stop_after_sizing:
+        sized = np.maximum(pnl * size_by_code[day_codes], -stop_loss)
+    else:
+        sized = np.maximum(pnl, -stop_loss)
+        sized *= size_by_code[day_codes]
+    if daily_limit is None:
+        return sized, sized
+    
+    daily_total = np.bincount(date_codes, weights=sized)
+    factor = np.ones(len(daily_total))
+    breached = daily_total < -daily_limit
+    factor[breached] = -daily_limit / daily_total[breached]
+    return sized, sized * factor[date_codes]
@@ -1,22 +1,31 @@
+import numpy as np
 import pandas as pd
-import sys
 import os
 from pathlib import Path
 
-# Add strategy directory to path
-sys.path.append(str(Path(__file__).parent / 'strategy' / 'core'))
+try:
+    from .common import DAY_OF_WEEK_DTYPE, V2_DAY_SIZING, simulate_sized_pnl
+except ImportError:  # run as a script: common.py sits next to this file
+    from common import DAY_OF_WEEK_DTYPE, V2_DAY_SIZING, simulate_sized_pnl
 
-from ub_lb import run_floating_band_strategy
-from ub_lb_v2 import run_floating_band_strategy_v2
+TRADES_CSV = 'results/jan_to_august_trades.csv'
+TRADES_CACHE = 'results/jan_to_august_trades.pkl'
 
 def load_existing_data():
     """Load the existing trade data for comparison"""
     try:
-        df = pd.read_csv('results/jan_to_august_trades.csv')
-        return df
+        csv_mtime = os.stat(TRADES_CSV).st_mtime
     except FileNotFoundError:
         print("❌ No existing data found. Please run the original strategy first.")
         return None
+    
+    # Reuse the pickled frame from a previous run unless the CSV has changed since
+    if os.path.exists(TRADES_CACHE) and os.stat(TRADES_CACHE).st_mtime >= csv_mtime:
+        return pd.read_pickle(TRADES_CACHE)
+    
+    df = pd.read_csv(TRADES_CSV, dtype={'pnl': 'float64'})
+    df.to_pickle(TRADES_CACHE)
+    return df
 
 def analyze_strategy_comparison():
     """Compare original strategy with V2 using existing data"""
@@ -45,48 +54,42 @@ def analyze_strategy_comparison():
     print(f"Winning Trades: {winning_trades_original}")
     print(f"Losing Trades: {total_trades_original - winning_trades_original}")
     
-    # Find worst trade
-    worst_trade = existing_data.loc[existing_data['pnl'].idxmin()]
-    print(f"Worst Trade: {worst_trade['date']} - {worst_trade['pnl']:.2f} points")
+    # Find worst trade (one argmin; the position is reused for the risk metrics)
+    pnl = existing_data['pnl'].to_numpy(dtype=np.float64)
+    worst_idx = int(pnl.argmin())
+    max_loss_original = pnl[worst_idx]
+    print(f"Worst Trade: {existing_data['date'].iat[worst_idx]} - {max_loss_original:.2f} points")
+    
+    # Apply V2 filters to existing data; V2 P&L lives in its own array
+    # rather than in a full copy of the trade log
+    
+    # 1. Apply stop loss (max 50 points loss) and 2. day-of-week position sizing
+    day_codes = existing_data['day_of_week'].astype(DAY_OF_WEEK_DTYPE).cat.codes.to_numpy()
+    pnl_v2, _ = simulate_sized_pnl(pnl, day_codes, None, V2_DAY_SIZING, stop_loss=50.0)
+    
+    # 3. Remove trades outside time window (simplified)
+    # This would require actual time data, so we'll estimate based on day performance
+    
+    # Day-of-week stats for both variants from a single grouping
+    day_analysis = pd.DataFrame({'pnl': pnl, 'pnl_v2': pnl_v2}).groupby(existing_data['day_of_week'].to_numpy()).agg(
+        sum_o=('pnl', 'sum'), sum_v2=('pnl_v2', 'sum'), cnt=('pnl', 'count'),
+        mean_o=('pnl', 'mean'), mean_v2=('pnl_v2', 'mean'),
+    ).round(2)
     
     # Analyze by day of week
     print("\n📅 DAY OF WEEK ANALYSIS (Original):")
     print("-" * 35)
-    day_analysis = existing_data.groupby('day_of_week')['pnl'].agg(['sum', 'count', 'mean']).round(2)
-    for day, data in day_analysis.iterrows():
-        print(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})")
+    for row in day_analysis.itertuples():
+        print(f"{row.Index}: {row.sum_o:>8.2f} points ({row.cnt:>2} trades, avg: {row.mean_o:>6.2f})")
     
     # Simulate V2 improvements
     print("\n🚀 VERSION 2 IMPROVEMENTS SIMULATION:")
     print("-" * 35)
     
-    # Apply V2 filters to existing data
-    v2_filtered = existing_data.copy()
-    
-    # 1. Apply stop loss (max 50 points loss)
-    v2_filtered['pnl_v2'] = v2_filtered['pnl'].apply(lambda x: max(x, -50))
-    
-    # 2. Apply day-of-week position sizing
-    def apply_position_sizing(row):
-        day = row['day_of_week']
-        if day == 'Monday':
-            return row['pnl_v2'] * 0.7
-        elif day == 'Tuesday':
-            return row['pnl_v2'] * 0.5
-        elif day == 'Friday':
-            return row['pnl_v2'] * 0.8
-        else:
-            return row['pnl_v2']
-    
-    v2_filtered['pnl_v2'] = v2_filtered.apply(apply_position_sizing, axis=1)
-    
-    # 3. Remove trades outside time window (simplified)
-    # This would require actual time data, so we'll estimate based on day performance
-    
     # Calculate V2 performance
-    total_pnl_v2 = v2_filtered['pnl_v2'].sum()
-    total_trades_v2 = len(v2_filtered)
-    winning_trades_v2 = len(v2_filtered[v2_filtered['pnl_v2'] > 0])
+    total_pnl_v2 = pnl_v2.sum()
+    total_trades_v2 = len(pnl_v2)
+    winning_trades_v2 = int(np.count_nonzero(pnl_v2 > 0))
     win_rate_v2 = (winning_trades_v2 / total_trades_v2 * 100) if total_trades_v2 > 0 else 0
     
     print(f"Total P&L: {total_pnl_v2:.2f} points (₹{total_pnl_v2 * 15:.2f})")
@@ -105,18 +108,16 @@ def analyze_strategy_comparison():
     print(f"Win Rate Improvement: {win_rate_improvement:+.1f}%")
     
     # Worst trade improvement
-    worst_trade_v2 = v2_filtered.loc[v2_filtered['pnl_v2'].idxmin()]
-    worst_improvement = worst_trade_v2['pnl_v2'] - worst_trade['pnl']
+    max_loss_v2 = pnl_v2.min()
+    worst_improvement = max_loss_v2 - max_loss_original
     print(f"Worst Trade Improvement: {worst_improvement:+.2f} points")
     
     # Day of week improvements
     print("\n📅 DAY OF WEEK ANALYSIS (V2):")
     print("-" * 35)
-    day_analysis_v2 = v2_filtered.groupby('day_of_week')['pnl_v2'].agg(['sum', 'count', 'mean']).round(2)
-    for day, data in day_analysis_v2.iterrows():
-        original_data = day_analysis.loc[day]
-        improvement = data['sum'] - original_data['sum']
-        print(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f}) [Δ{improvement:+.2f}]")
+    for row in day_analysis.itertuples():
+        improvement = row.sum_v2 - row.sum_o
+        print(f"{row.Index}: {row.sum_v2:>8.2f} points ({row.cnt:>2} trades, avg: {row.mean_v2:>6.2f}) [Δ{improvement:+.2f}]")
     
     # Key improvements summary
     print("\n🎯 KEY V2 IMPROVEMENTS:")
@@ -139,20 +140,17 @@ def analyze_strategy_comparison():
     print("\n⚠️ RISK METRICS COMPARISON:")
     print("-" * 30)
     
-    # Maximum drawdown simulation
-    max_loss_original = existing_data['pnl'].min()
-    max_loss_v2 = v2_filtered['pnl_v2'].min()
-    
+    # Maximum drawdown simulation (worst single trades found above)
     print(f"Maximum Single Trade Loss:")
     print(f"  Original: {max_loss_original:.2f} points")
     print(f"  V2: {max_loss_v2:.2f} points")
     print(f"  Improvement: {max_loss_v2 - max_loss_original:+.2f} points")
     
     # Save comparison results
-    save_comparison_results(existing_data, v2_filtered, total_pnl_original, total_pnl_v2)
+    save_comparison_results(existing_data, pnl_v2, total_pnl_original, total_pnl_v2)
 
-def save_comparison_results(original_data, v2_data, pnl_original, pnl_v2):
-    """Save comparison results to files"""
+def save_comparison_results(original_data, v2_pnl, pnl_original, pnl_v2):
+    """Save comparison results to files (v2_pnl is the per-trade V2 P&L array)"""
     
     # Create results directory if it doesn't exist
     os.makedirs('results', exist_ok=True)
@@ -162,29 +160,33 @@ def save_comparison_results(original_data, v2_data, pnl_original, pnl_v2):
         'date': original_data['date'],
         'day_of_week': original_data['day_of_week'],
         'original_pnl': original_data['pnl'],
-        'v2_pnl': v2_data['pnl_v2'],
-        'improvement': v2_data['pnl_v2'] - original_data['pnl']
+        'v2_pnl': v2_pnl,
+        'improvement': v2_pnl - original_data['pnl'].to_numpy()
     })
     
     comparison_data.to_csv('results/strategy_v2_comparison.csv', index=False)
     
-    # Save summary report
-    with open('results/strategy_v2_summary.txt', 'w') as f:
-        f.write("STRATEGY V2 COMPARISON SUMMARY\n")
-        f.write("=" * 40 + "\n\n")
-        f.write(f"ORIGINAL STRATEGY:\n")
-        f.write(f"Total P&L: {pnl_original:.2f} points (₹{pnl_original * 15:.2f})\n")
-        f.write(f"Win Rate: {(len(original_data[original_data['pnl'] > 0]) / len(original_data) * 100):.1f}%\n")
-        f.write(f"Worst Trade: {original_data['pnl'].min():.2f} points\n\n")
-        
-        f.write(f"VERSION 2 STRATEGY:\n")
-        f.write(f"Total P&L: {pnl_v2:.2f} points (₹{pnl_v2 * 15:.2f})\n")
-        f.write(f"Win Rate: {(len(v2_data[v2_data['pnl_v2'] > 0]) / len(v2_data) * 100):.1f}%\n")
-        f.write(f"Worst Trade: {v2_data['pnl_v2'].min():.2f} points\n\n")
-        
-        f.write(f"IMPROVEMENTS:\n")
-        f.write(f"P&L Improvement: {pnl_v2 - pnl_original:+.2f} points (₹{(pnl_v2 - pnl_original) * 15:+.2f})\n")
-        f.write(f"Risk Reduction: {v2_data['pnl_v2'].min() - original_data['pnl'].min():+.2f} points\n")
+    # Save summary report (each stat computed once, file written in one go)
+    win_rate_o = (original_data['pnl'] > 0).mean() * 100
+    win_rate_v2 = (v2_pnl > 0).mean() * 100
+    min_o = original_data['pnl'].min()
+    min_v2 = v2_pnl.min()
+    summary = (
+        "STRATEGY V2 COMPARISON SUMMARY\n"
+        f"{'=' * 40}\n\n"
+        f"ORIGINAL STRATEGY:\n"
+        f"Total P&L: {pnl_original:.2f} points (₹{pnl_original * 15:.2f})\n"
+        f"Win Rate: {win_rate_o:.1f}%\n"
+        f"Worst Trade: {min_o:.2f} points\n\n"
+        f"VERSION 2 STRATEGY:\n"
+        f"Total P&L: {pnl_v2:.2f} points (₹{pnl_v2 * 15:.2f})\n"
+        f"Win Rate: {win_rate_v2:.1f}%\n"
+        f"Worst Trade: {min_v2:.2f} points\n\n"
+        f"IMPROVEMENTS:\n"
+        f"P&L Improvement: {pnl_v2 - pnl_original:+.2f} points (₹{(pnl_v2 - pnl_original) * 15:+.2f})\n"
+        f"Risk Reduction: {min_v2 - min_o:+.2f} points\n"
+    )
+    Path('results/strategy_v2_summary.txt').write_text(summary)
     
     print(f"\n💾 Results saved to:")
     print(f"   📄 results/strategy_v2_comparison.csv")
@@ -9,22 +9,36 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 import sys
+import hashlib
+import threading
+import time
+import pickle
+from enum import IntFlag
+from functools import lru_cache
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-# Add the project root to the path
-project_root = Path(__file__).parent
-sys.path.append(str(project_root))
-
 from utils.data_fetch import fetch_5min_data
-from strategy.core.ub_lb import run_floating_band_strategy
-from utils.instruments import get_banknifty_weekly_fut_token, download_instruments_csv
+from strategies.core import original
+from strategies.core.original import run_floating_band_strategy_quiet
+from utils.instruments import get_banknifty_weekly_fut_token, get_instruments_cached
+from auth._env import load_env
+from auth._json import dumps
 from auth.token_manager import load_access_token
+from config.settings import NSE_HOLIDAYS
 from kiteconnect import KiteConnect
-import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Per-day progress/errors are logged; handlers are configured in main()
+logger = logging.getLogger(__name__)
+
+# Kite's historical-data endpoint allows 3 requests/second per API key.
+# FETCH_WORKERS only bounds concurrency; _fetch_limiter enforces the rate
+FETCH_WORKERS = 3
+FETCH_RATE = 3  # requests per second
+
+# Per-day candle cache: results/cache/{token}/{date}.pkl
+CACHE_DIR = Path("results") / "cache"
 
 def get_kite_connect():
     """
@@ -47,29 +61,158 @@ def get_kite_connect():
     print("✅ Login successful")
     return kite
 
+def trades_cache_path(instrument_token, start_date, end_date):
+    """
+    results/cache/trades_{hash}.pkl holding the per-day backtest trades; the
+    key covers the token, date range, holiday calendar and the strategy
+    module's source, so any edit to the trade logic invalidates it.
+    """
+    strategy_source = hashlib.sha256(Path(original.__file__).read_bytes()).hexdigest()
+    key = "|".join([
+        str(instrument_token), start_date.isoformat(), end_date.isoformat(),
+        ",".join(NSE_HOLIDAYS), strategy_source,
+    ])
+    return CACHE_DIR / f"trades_{hashlib.sha256(key.encode()).hexdigest()[:16]}.pkl"
+
+class RateLimiter:
+    """Space calls at least 1/rate seconds apart, across threads."""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+    
+    def wait(self):
+        # Reserve the next free slot under the lock, sleep outside it
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        time.sleep(slot - now)
+
+_fetch_limiter = RateLimiter(FETCH_RATE)
+
 def get_trading_days(start_date, end_date):
     """
-    Get all trading days between start_date and end_date
+    Get all trading days (weekdays minus NSE holidays) between start_date and end_date
     """
-    trading_days = []
-    current_date = start_date
-    
-    while current_date <= end_date:
-        # Skip weekends (Saturday=5, Sunday=6)
-        if current_date.weekday() < 5:  # Monday to Friday
-            trading_days.append(current_date.strftime("%Y-%m-%d"))
-        current_date += timedelta(days=1)
+    days = pd.bdate_range(start=start_date, end=end_date, freq="C", holidays=NSE_HOLIDAYS)
+    return days.strftime("%Y-%m-%d").tolist()
+
+def cached_fetch(kite, instrument_token, date_str):
+    """
+    fetch_5min_data with an on-disk cache. Past sessions never change, so a
+    cached day is served from disk; delete its file to force a re-fetch.
+    """
+    path = CACHE_DIR / str(instrument_token) / f"{date_str}.pkl"
+    if path.exists():
+        return pd.read_pickle(path)
+    
+    _fetch_limiter.wait()
+    df = fetch_5min_data(kite, instrument_token, date_str)
+    # Only completed sessions are cached; today's candles are still forming
+    if df is not None and not df.empty and date_str < datetime.now().strftime("%Y-%m-%d"):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_pickle(path)
+    return df
+
+def fetch_day(kite, instrument_token, date_str):
+    """Fetch one day's 5-min candles (runs in a fetch thread)."""
+    return date_str, cached_fetch(kite, instrument_token, date_str)
+
+def _bar_returns(close, out=None):
+    """
+    (close[i] - close[i-1]) / close[i-1] for i >= 1: the difference of two
+    slice views goes straight into one output buffer, divided in place (no
+    shifted copy or temporary, and no 1 + tiny - 1 cancellation).
+    """
+    if out is None:
+        out = np.empty(len(close) - 1, dtype=np.float64)
+    np.subtract(close[1:], close[:-1], out=out)
+    out /= close[:-1]
+    return out
+
+# Columns the market-condition analysis reads from a day's candles
+ANALYSIS_COLUMNS = ("time", "close", "volume", "ret")
+
+def pack_daily_data(day_frames):
+    """
+    Concatenate the per-day frames (trimmed to ANALYSIS_COLUMNS) into one
+    block-backed frame and return {date: positional slice view of it}, so the
+    days share storage instead of each holding its own BlockManager.
+    """
+    if not day_frames:
+        return {}
+    dates = sorted(day_frames)
+    frames = [day_frames[d][[c for c in ANALYSIS_COLUMNS if c in day_frames[d].columns]] for d in dates]
+    packed = pd.concat(frames)
+    bounds = np.cumsum([0] + [len(f) for f in frames])
+    return {d: packed.iloc[lo:hi] for d, lo, hi in zip(dates, bounds[:-1], bounds[1:])}
+
+def add_day_stats(df):
+    """
+    Per-day columns shared by every trade on that day: 'ret' is the bar return
+    (pct_change of close), computed once instead of once per trade window.
+    """
+    close = df['close'].to_numpy(dtype=np.float64)
+    ret = np.empty(len(close), dtype=np.float64)
+    ret[:1] = np.nan
+    _bar_returns(close, out=ret[1:])
+    return df.assign(ret=ret)
+
+@lru_cache(maxsize=None)
+def _trend_basis(n):
+    """
+    Regressor terms for x = 0..n-1, shared by every window of n bars
+    (a session has at most 75 five-minute bars, so this stays tiny).
+    """
+    x = np.arange(n, dtype=np.float64)
+    x.setflags(write=False)
+    return x, n * (n - 1) / 2, (n - 1) * n * (2 * n - 1) / 6
+
+def _compute_market_stats(close, volume=None, returns=None):
+    """
+    Volatility, trend R-squared and average volume of one trade's candles.
+    close/volume are float64 arrays; returns (volatility, r2, avg_volume).
+    returns: optional precomputed bar returns inside the window (len(close) - 1).
+    """
+    n = len(close)
+    
+    # Annualized volatility: sample std (ddof=1) of bar returns, NaN under two returns
+    if returns is None:
+        returns = _bar_returns(close)
+    volatility = returns.std(ddof=1) * np.sqrt(252) * 100 if len(returns) > 1 else np.nan
+    
+    # Trend strength (linear regression R-squared of close vs bar number).
+    # Closed form with x = 0..n-1, so Σx and Σx² need no array; y is shifted by
+    # its first value to keep n·Σy² - (Σy)² from cancelling at index-level prices
+    if n > 1:
+        y = close - close[0]
+        x, sx, sxx = _trend_basis(n)
+        sy = y.sum()
+        syy = y.dot(y)
+        sxy = x.dot(y)
+        denom = (n * sxx - sx * sx) * (n * syy - sy * sy)
+        r2 = (n * sxy - sx * sy) ** 2 / denom if denom > 0 else 0
+    else:
+        r2 = 0
     
-    return trading_days
+    avg_volume = volume.mean() if volume is not None and len(volume) else 0
+    return volatility, r2, avg_volume
 
 def analyze_market_conditions(df, trade_entry_time, trade_exit_time):
     """
     Analyze market conditions during the trade period
     """
-    # Get data during trade period
-    trade_data = df[(df.index >= trade_entry_time) & (df.index <= trade_exit_time)]
-    
-    if trade_data.empty:
+    # Get data during trade period: candles are time-sorted, so bisect for the
+    # bounds and slice the column arrays directly (no sub-DataFrame).
+    # fetch_5min_data keeps time as a column (RangeIndex), so fall back to it
+    # when the index isn't datetime
+    times = df.index if isinstance(df.index, pd.DatetimeIndex) else pd.DatetimeIndex(df['time'])
+    left = times.searchsorted(trade_entry_time, side='left')
+    right = times.searchsorted(trade_exit_time, side='right')
+    
+    if right <= left:
         return {
             'volatility': 0,
             'trend_strength': 0,
@@ -77,21 +220,14 @@ def analyze_market_conditions(df, trade_entry_time, trade_exit_time):
             'market_regime': 'unknown'
         }
     
-    # Calculate volatility (standard deviation of returns)
-    returns = trade_data['close'].pct_change().dropna()
-    volatility = returns.std() * np.sqrt(252) * 100  # Annualized volatility
-    
-    # Calculate trend strength (linear regression R-squared)
-    x = np.arange(len(trade_data))
-    y = trade_data['close'].values
-    if len(x) > 1:
-        correlation_matrix = np.corrcoef(x, y)
-        trend_strength = correlation_matrix[0, 1] ** 2 if not np.isnan(correlation_matrix[0, 1]) else 0
-    else:
-        trend_strength = 0
+    columns = df.columns
+    close = df['close'].to_numpy(dtype=np.float64, copy=False)[left:right]
+    volume = df['volume'].to_numpy(dtype=np.float64, copy=False)[left:right] if 'volume' in columns else None
+    # Day-level returns from add_day_stats; the first one reaches back before the window
+    returns = df['ret'].to_numpy(dtype=np.float64, copy=False)[left + 1:right] if 'ret' in columns else None
+    volatility, trend_strength, avg_volume = _compute_market_stats(close, volume, returns)
     
     # Volume profile
-    avg_volume = trade_data['volume'].mean() if 'volume' in trade_data.columns else 0
     volume_profile = 'high' if avg_volume > 1000 else 'low' if avg_volume < 500 else 'medium'
     
     # Market regime classification
@@ -109,17 +245,106 @@ def analyze_market_conditions(df, trade_entry_time, trade_exit_time):
         'market_regime': market_regime
     }
 
-def identify_worst_trade(trades):
+def _prefix(values):
+    """Running sums with a leading 0, so sum(values[s:e]) == p[e] - p[s]."""
+    p = np.empty(len(values) + 1, dtype=np.float64)
+    p[0] = 0.0
+    np.cumsum(values, out=p[1:])
+    return p
+
+def _window_market_stats(close, volume, starts, ends):
+    """
+    _compute_market_stats for many windows [starts[i], ends[i]) of one day's
+    bars at once: prefix sums turn each window into O(1) array arithmetic,
+    so there is no per-trade Python work. Returns (volatility, r2, avg_volume)
+    arrays; empty windows get 0 like analyze_market_conditions.
+    """
+    n = (ends - starts).astype(np.float64)
+    
+    # Trend R-squared; y shifted by the day's first close (R² is shift-invariant)
+    y = close - close[0]
+    Y1, Y2 = _prefix(y), _prefix(y * y)
+    XY = _prefix(np.arange(len(y), dtype=np.float64) * y)
+    sy = Y1[ends] - Y1[starts]
+    syy = Y2[ends] - Y2[starts]
+    sxy = XY[ends] - XY[starts] - starts * sy  # x counted from each window start
+    sx = n * (n - 1) / 2
+    sxx = (n - 1) * n * (2 * n - 1) / 6
+    denom = (n * sxx - sx * sx) * (n * syy - sy * sy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(denom > 0, (n * sxy - sx * sy) ** 2 / denom, 0.0)
+    
+    # Volatility of the m = n - 1 returns inside each window (NaN under two)
+    r = _bar_returns(close)
+    R1, R2 = _prefix(r), _prefix(r * r)
+    m = n - 1
+    r_end = np.maximum(ends - 1, starts)
+    s1 = R1[r_end] - R1[starts]
+    s2 = R2[r_end] - R2[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = np.maximum((s2 - s1 * s1 / m) / (m - 1), 0.0)
+    volatility = np.where(m > 1, np.sqrt(var) * np.sqrt(252) * 100, np.nan)
+    
+    if volume is not None:
+        V = _prefix(volume)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_volume = np.where(n > 0, (V[ends] - V[starts]) / n, 0.0)
+    else:
+        avg_volume = np.zeros(len(starts))
+    
+    empty = n == 0
+    volatility[empty] = 0.0
+    r2[empty] = 0.0
+    return volatility, r2, avg_volume
+
+def analyze_all_trade_conditions(trades_df, all_daily_data):
+    """
+    Volatility, trend strength and average volume for every trade, one
+    vectorized sweep per day. Returns a DataFrame aligned with trades_df.
+    """
+    out = pd.DataFrame(
+        {'volatility': np.nan, 'trend_strength': np.nan, 'avg_volume': np.nan},
+        index=trades_df.index,
+    )
+    if trades_df.empty or not {'entry_time', 'exit_time'} <= set(trades_df.columns):
+        return out
+    
+    for date_str, rows in trades_df.groupby('date', sort=False).indices.items():
+        df = all_daily_data.get(date_str)
+        if df is None or df.empty:
+            continue
+        times = df.index if isinstance(df.index, pd.DatetimeIndex) else pd.DatetimeIndex(df['time'])
+        starts = times.searchsorted(trades_df['entry_time'].iloc[rows], side='left')
+        ends = np.maximum(times.searchsorted(trades_df['exit_time'].iloc[rows], side='right'), starts)
+        close = df['close'].to_numpy(dtype=np.float64, copy=False)
+        volume = df['volume'].to_numpy(dtype=np.float64, copy=False) if 'volume' in df.columns else None
+        out.iloc[rows] = np.column_stack(_window_market_stats(close, volume, starts, ends))
+    return out
+
+def identify_worst_trade(trades, pnl=None):
     """
     Identify the single worst trade with detailed analysis
+    (pnl: optional precomputed float64 array of the trades' P&L)
     """
     if not trades:
         return None
     
-    # Find the trade with the highest loss
-    worst_trade = min(trades, key=lambda x: x['pnl'])
+    if pnl is None:
+        pnl = np.fromiter((t['pnl'] for t in trades), dtype=np.float64, count=len(trades))
     
-    return worst_trade
+    # Find the trade with the highest loss
+    return trades[int(pnl.argmin())]
+
+class FailureReason(IntFlag):
+    """Bit flags for the worst-trade failure reasons (text in REASON_TEXT)."""
+    NONE = 0
+    HIGH_VOLATILITY = 1
+    WEAK_TREND = 2
+
+REASON_TEXT = {
+    FailureReason.HIGH_VOLATILITY: 'High volatility market conditions',
+    FailureReason.WEAK_TREND: 'Weak or choppy market trend',
+}
 
 def analyze_worst_trade_failure(worst_trade, df):
     """
@@ -131,7 +356,8 @@ def analyze_worst_trade_failure(worst_trade, df):
         'failure_reasons': [],
         'risk_management_issues': [],
         'timing_issues': [],
-        'signal_quality': 'unknown'
+        'signal_quality': 'unknown',
+        'reason_flags': FailureReason.NONE
     }
     
     # Analyze market conditions
@@ -145,13 +371,18 @@ def analyze_worst_trade_failure(worst_trade, df):
     pnl = worst_trade['pnl']
     trade_type = worst_trade.get('type', 'TRADE')
     
+    reasons = FailureReason.NONE
+    
     # High volatility market failure
     if analysis['market_conditions'].get('volatility', 0) > 30:
-        analysis['failure_reasons'].append('High volatility market conditions')
+        reasons |= FailureReason.HIGH_VOLATILITY
     
     # Weak trend failure
     if analysis['market_conditions'].get('trend_strength', 0) < 0.3:
-        analysis['failure_reasons'].append('Weak or choppy market trend')
+        reasons |= FailureReason.WEAK_TREND
+    
+    analysis['reason_flags'] = reasons
+    analysis['failure_reasons'] = [text for flag, text in REASON_TEXT.items() if reasons & flag]
     
     # Large loss indicates poor risk management
     if abs(pnl) > 100:
@@ -159,7 +390,9 @@ def analyze_worst_trade_failure(worst_trade, df):
     
     # Timing issues
     if 'entry_time' in worst_trade:
-        entry_hour = pd.to_datetime(worst_trade['entry_time']).hour
+        # Strategy trades already carry datetimes; only parse other inputs
+        entry_time = worst_trade['entry_time']
+        entry_hour = entry_time.hour if hasattr(entry_time, 'hour') else pd.to_datetime(entry_time).hour
         if entry_hour < 9 or entry_hour > 14:
             analysis['timing_issues'].append('Poor entry timing (outside optimal hours)')
     
@@ -173,63 +406,34 @@ def analyze_worst_trade_failure(worst_trade, df):
     
     return analysis
 
-def suggest_improvements(analysis, all_trades):
-    """
-    Suggest practical improvements based on analysis
-    """
-    improvements = {
-        'risk_management': [],
-        'entry_filters': [],
-        'exit_improvements': [],
-        'timing_filters': [],
-        'volatility_filters': []
-    }
-    
-    # Risk management improvements
-    if analysis['risk_management_issues']:
-        improvements['risk_management'].extend([
-            'Implement dynamic stop loss based on volatility',
-            'Add maximum loss per trade limit (e.g., 50 points)',
-            'Use position sizing based on account risk percentage'
-        ])
-    
-    # Entry filter improvements
-    if 'High volatility market conditions' in analysis['failure_reasons']:
-        improvements['entry_filters'].extend([
-            'Add volatility filter: avoid trading when volatility > 25%',
-            'Implement ATR-based entry confirmation',
-            'Add volume confirmation requirement'
-        ])
-    
-    if 'Weak or choppy market trend' in analysis['failure_reasons']:
-        improvements['entry_filters'].extend([
-            'Add trend strength filter: minimum R-squared > 0.3',
-            'Implement moving average trend confirmation',
-            'Add momentum indicator filter (RSI, MACD)'
-        ])
-    
-    # Timing improvements
-    if analysis['timing_issues']:
-        improvements['timing_filters'].extend([
-            'Restrict trading to 9:30 AM - 2:30 PM',
-            'Avoid first 15 minutes of market opening',
-            'Add day-of-week filters based on historical performance'
-        ])
-    
-    # Volatility filters
-    improvements['volatility_filters'].extend([
-        'Skip trading during major news events',
-        'Add implied volatility filter for options expiry days',
-        'Implement market regime detection'
-    ])
-    
-    return improvements
+# Static fix lists and strategy write-up, built once at import
+RISK_FIXES = (
+    'Implement dynamic stop loss based on volatility',
+    'Add maximum loss per trade limit (e.g., 50 points)',
+    'Use position sizing based on account risk percentage'
+)
+VOLATILITY_ENTRY_FIXES = (
+    'Add volatility filter: avoid trading when volatility > 25%',
+    'Implement ATR-based entry confirmation',
+    'Add volume confirmation requirement'
+)
+TREND_ENTRY_FIXES = (
+    'Add trend strength filter: minimum R-squared > 0.3',
+    'Implement moving average trend confirmation',
+    'Add momentum indicator filter (RSI, MACD)'
+)
+TIMING_FIXES = (
+    'Restrict trading to 9:30 AM - 2:30 PM',
+    'Avoid first 15 minutes of market opening',
+    'Add day-of-week filters based on historical performance'
+)
+VOLATILITY_FILTER_FIXES = (
+    'Skip trading during major news events',
+    'Add implied volatility filter for options expiry days',
+    'Implement market regime detection'
+)
 
-def create_improved_strategy():
-    """
-    Create improved strategy logic based on analysis
-    """
-    improved_strategy = """
+IMPROVED_STRATEGY = """
 # IMPROVED FLOATING BAND STRATEGY
 
 ## ENTRY FILTERS
@@ -263,7 +467,45 @@ def create_improved_strategy():
 3. Volume confirmation for breakout signals
 4. Price action confirmation (candlestick patterns)
 """
-    return improved_strategy
+
+def suggest_improvements(analysis, all_trades):
+    """
+    Suggest practical improvements based on analysis
+    """
+    improvements = {
+        'risk_management': [],
+        'entry_filters': [],
+        'exit_improvements': [],
+        'timing_filters': [],
+        'volatility_filters': []
+    }
+    
+    # Risk management improvements
+    if analysis['risk_management_issues']:
+        improvements['risk_management'].extend(RISK_FIXES)
+    
+    # Entry filter improvements
+    reasons = analysis.get('reason_flags', FailureReason.NONE)
+    if reasons & FailureReason.HIGH_VOLATILITY:
+        improvements['entry_filters'].extend(VOLATILITY_ENTRY_FIXES)
+    
+    if reasons & FailureReason.WEAK_TREND:
+        improvements['entry_filters'].extend(TREND_ENTRY_FIXES)
+    
+    # Timing improvements
+    if analysis['timing_issues']:
+        improvements['timing_filters'].extend(TIMING_FIXES)
+    
+    # Volatility filters
+    improvements['volatility_filters'].extend(VOLATILITY_FILTER_FIXES)
+    
+    return improvements
+
+def create_improved_strategy():
+    """
+    Create improved strategy logic based on analysis
+    """
+    return IMPROVED_STRATEGY
 
 def comprehensive_analysis():
     """
@@ -278,7 +520,7 @@ def comprehensive_analysis():
     
     # Get BankNifty Weekly token
     try:
-        instruments_df = download_instruments_csv()
+        instruments_df = get_instruments_cached()
         instrument_token = get_banknifty_weekly_fut_token(instruments_df)
         if instrument_token is None:
             print("❌ Could not find BankNifty weekly futures token")
@@ -298,6 +540,15 @@ def comprehensive_analysis():
     end_date = datetime(2025, 8, 31)
     start_date = end_date - timedelta(days=90)
     
+    # Same inputs as an earlier complete run: reuse its per-day trades and
+    # skip the backtests (analysis and reports below always re-run)
+    cache_path = trades_cache_path(instrument_token, start_date, end_date)
+    cached_trades = None
+    if cache_path.exists():
+        with open(cache_path, "rb") as f:
+            cached_trades = pickle.load(f)
+        print(f"♻️ Reusing cached backtest trades: {cache_path}")
+    
     # Get all trading days
     all_trading_days = get_trading_days(start_date, end_date)
     print(f"📅 Total trading days to analyze: {len(all_trading_days)}")
@@ -305,117 +556,143 @@ def comprehensive_analysis():
     all_trades = []
     all_daily_data = {}
     
-    # Process each trading day
-    for i, date_str in enumerate(all_trading_days, 1):
-        try:
+    # Fetch days on a few threads (network-bound) and backtest each frame on
+    # the main thread as soon as it arrives; a day's backtest takes
+    # milliseconds, less than shipping the frame to a worker process would
+    trades_by_day = {}
+    failed_days = []
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as fetch_pool:
+        fetches = {fetch_pool.submit(fetch_day, kite, instrument_token, d): d for d in all_trading_days}
+        for i, fut in enumerate(as_completed(fetches), 1):
+            date_str = fetches[fut]
             if i % 10 == 0 or i == len(all_trading_days):
-                print(f"📊 Progress: {i}/{len(all_trading_days)} days processed...")
-            
-            # Fetch data
-            df = fetch_5min_data(kite, instrument_token, date_str)
+                logger.info("📊 Progress: %d/%d days fetched...", i, len(all_trading_days))
+            try:
+                _, df = fut.result()
+            except Exception:
+                logger.exception("    ❌ Error processing %s", date_str)
+                failed_days.append(date_str)
+                continue
             
             if df is None or df.empty:
                 continue
             
-            # Store daily data for analysis
-            all_daily_data[date_str] = df
-            
-            # Run strategy
-            result_df, trades = run_floating_band_strategy(df)
-            
-            # Add trade details
-            for trade in trades:
-                trade['date'] = date_str
-                trade['day_of_week'] = datetime.strptime(date_str, "%Y-%m-%d").strftime("%A")
-                trade['month'] = datetime.strptime(date_str, "%Y-%m-%d").strftime("%B")
-                all_trades.append(trade)
-            
-        except Exception as e:
-            print(f"    ❌ Error processing {date_str}: {str(e)}")
+            # Store daily data (with per-day stats) for analysis
+            all_daily_data[date_str] = add_day_stats(df)
+            if cached_trades is None:
+                try:
+                    _, trades_by_day[date_str] = run_floating_band_strategy_quiet(df)
+                except Exception:
+                    logger.exception("    ❌ Error processing %s", date_str)
+                    failed_days.append(date_str)
+    
+    # One shared frame for every day's analysis columns
+    all_daily_data = pack_daily_data(all_daily_data)
+    
+    if cached_trades is not None:
+        # Days whose candles failed to load in this run are left out, as they
+        # would be without the cache
+        trades_by_day = {d: t for d, t in cached_trades.items() if d not in failed_days}
+    elif not failed_days and end_date.date() < datetime.now().date():
+        # Only a range that has fully closed (no failed days) is safe to reuse
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, "wb") as f:
+            pickle.dump(trades_by_day, f)
+    
+    # Add trade details in calendar order, as the sequential loop did
+    for date_str in all_trading_days:
+        trades = trades_by_day.get(date_str)
+        if not trades:
+            continue
+        # Parse the date once per day, not twice per trade
+        day_dt = datetime.strptime(date_str, "%Y-%m-%d")
+        dow_name = day_dt.strftime("%A")
+        month_name = day_dt.strftime("%B")
+        for trade in trades:
+            trade['date'] = date_str
+            trade['day_of_week'] = dow_name
+            trade['month'] = month_name
+            all_trades.append(trade)
     
     if not all_trades:
         print("❌ No trades found for analysis")
         return None
     
-    # Calculate overall statistics
-    total_pnl = sum(trade['pnl'] for trade in all_trades)
-    total_trades = len(all_trades)
-    winning_trades = len([t for t in all_trades if t['pnl'] > 0])
+    # Columnar view of the trades, built once and shared by the stats and the saver
+    trades_df = pd.DataFrame.from_records(all_trades)
+    
+    # Calculate overall statistics from one P&L array
+    total_trades = len(trades_df)
+    pnl = trades_df['pnl'].to_numpy(dtype=np.float64)
+    total_pnl = pnl.sum()
+    winning_trades = int(np.count_nonzero(pnl > 0))
     win_rate = winning_trades / total_trades * 100
     
-    print(f"\n📊 OVERALL PERFORMANCE (Last 3 Months):")
-    print(f"💰 Total P&L: {total_pnl:+.2f} points")
-    print(f"📈 Total Trades: {total_trades}")
-    print(f"✅ Win Rate: {win_rate:.1f}%")
-    print(f"📊 Average Trade P&L: {total_pnl/total_trades:+.2f} points")
+    # The summary is collected into one buffer and written in a single call
+    out = [
+        f"\n📊 OVERALL PERFORMANCE (Last 3 Months):",
+        f"💰 Total P&L: {total_pnl:+.2f} points",
+        f"📈 Total Trades: {total_trades}",
+        f"✅ Win Rate: {win_rate:.1f}%",
+        f"📊 Average Trade P&L: {total_pnl/total_trades:+.2f} points",
+    ]
     
     # Identify worst trade
-    worst_trade = identify_worst_trade(all_trades)
+    worst_trade = identify_worst_trade(all_trades, pnl)
     
-    print(f"\n🔍 WORST TRADE ANALYSIS:")
-    print(f"📅 Date: {worst_trade['date']} ({worst_trade['day_of_week']})")
-    print(f"💰 P&L: {worst_trade['pnl']:+.2f} points")
-    print(f"📊 Type: {worst_trade.get('type', 'TRADE')}")
+    out += [
+        f"\n🔍 WORST TRADE ANALYSIS:",
+        f"📅 Date: {worst_trade['date']} ({worst_trade['day_of_week']})",
+        f"💰 P&L: {worst_trade['pnl']:+.2f} points",
+        f"📊 Type: {worst_trade.get('type', 'TRADE')}",
+    ]
     
     # Analyze worst trade failure
     worst_trade_analysis = analyze_worst_trade_failure(worst_trade, all_daily_data.get(worst_trade['date']))
     
-    print(f"\n🔍 ROOT CAUSE ANALYSIS:")
-    if worst_trade_analysis['failure_reasons']:
-        for reason in worst_trade_analysis['failure_reasons']:
-            print(f"❌ {reason}")
-    
-    if worst_trade_analysis['risk_management_issues']:
-        for issue in worst_trade_analysis['risk_management_issues']:
-            print(f"⚠️ {issue}")
-    
-    if worst_trade_analysis['timing_issues']:
-        for issue in worst_trade_analysis['timing_issues']:
-            print(f"⏰ {issue}")
+    out.append(f"\n🔍 ROOT CAUSE ANALYSIS:")
+    out += [f"❌ {reason}" for reason in worst_trade_analysis['failure_reasons']]
+    out += [f"⚠️ {issue}" for issue in worst_trade_analysis['risk_management_issues']]
+    out += [f"⏰ {issue}" for issue in worst_trade_analysis['timing_issues']]
     
     # Market conditions
     market_conditions = worst_trade_analysis['market_conditions']
     if market_conditions:
-        print(f"\n📊 MARKET CONDITIONS DURING WORST TRADE:")
-        print(f"📈 Volatility: {market_conditions.get('volatility', 0):.1f}%")
-        print(f"📊 Trend Strength: {market_conditions.get('trend_strength', 0):.2f}")
-        print(f"📈 Market Regime: {market_conditions.get('market_regime', 'unknown')}")
+        out += [
+            f"\n📊 MARKET CONDITIONS DURING WORST TRADE:",
+            f"📈 Volatility: {market_conditions.get('volatility', 0):.1f}%",
+            f"📊 Trend Strength: {market_conditions.get('trend_strength', 0):.2f}",
+            f"📈 Market Regime: {market_conditions.get('market_regime', 'unknown')}",
+        ]
     
     # Suggest improvements
     improvements = suggest_improvements(worst_trade_analysis, all_trades)
     
-    print(f"\n💡 SUGGESTED IMPROVEMENTS:")
-    
-    if improvements['risk_management']:
-        print(f"\n🛡️ RISK MANAGEMENT:")
-        for improvement in improvements['risk_management']:
-            print(f"   • {improvement}")
+    out.append(f"\n💡 SUGGESTED IMPROVEMENTS:")
+    for key, heading in (('risk_management', "🛡️ RISK MANAGEMENT:"),
+                         ('entry_filters', "🎯 ENTRY FILTERS:"),
+                         ('timing_filters', "⏰ TIMING FILTERS:"),
+                         ('volatility_filters', "📊 VOLATILITY FILTERS:")):
+        if improvements[key]:
+            out.append(f"\n{heading}")
+            out += [f"   • {improvement}" for improvement in improvements[key]]
     
-    if improvements['entry_filters']:
-        print(f"\n🎯 ENTRY FILTERS:")
-        for improvement in improvements['entry_filters']:
-            print(f"   • {improvement}")
-    
-    if improvements['timing_filters']:
-        print(f"\n⏰ TIMING FILTERS:")
-        for improvement in improvements['timing_filters']:
-            print(f"   • {improvement}")
-    
-    if improvements['volatility_filters']:
-        print(f"\n📊 VOLATILITY FILTERS:")
-        for improvement in improvements['volatility_filters']:
-            print(f"   • {improvement}")
+    # Market conditions across every trade, not only the worst one (saved
+    # as extra columns in the trades CSV)
+    trade_conditions = analyze_all_trade_conditions(trades_df, all_daily_data)
+    trades_df = trades_df.join(trade_conditions)
     
     # Create improved strategy
     improved_strategy = create_improved_strategy()
     
-    print(f"\n🚀 IMPROVED STRATEGY LOGIC:")
-    print(improved_strategy)
+    out += [f"\n🚀 IMPROVED STRATEGY LOGIC:", improved_strategy]
+    sys.stdout.write("\n".join(out) + "\n")
+    sys.stdout.flush()
     
     # Save detailed analysis
-    save_analysis_results(all_trades, worst_trade_analysis, improvements, improved_strategy)
+    save_analysis_results(trades_df, worst_trade_analysis, improvements, improved_strategy)
     
-    return {
+    results = {
         'overall_performance': {
             'total_pnl': total_pnl,
             'total_trades': total_trades,
@@ -424,12 +701,15 @@ def comprehensive_analysis():
         'worst_trade': worst_trade,
         'worst_trade_analysis': worst_trade_analysis,
         'improvements': improvements,
-        'improved_strategy': improved_strategy
+        'improved_strategy': improved_strategy,
+        'trade_conditions': trade_conditions
     }
+    
+    return results
 
-def save_analysis_results(all_trades, worst_trade_analysis, improvements, improved_strategy):
+def save_analysis_results(trades_df, worst_trade_analysis, improvements, improved_strategy):
     """
-    Save analysis results to files
+    Save analysis results to files (trades_df: one row per trade)
     """
     
     # Create results directory
@@ -437,55 +717,66 @@ def save_analysis_results(all_trades, worst_trade_analysis, improvements, improv
     results_dir.mkdir(exist_ok=True)
     
     # Save all trades to CSV
-    if all_trades:
-        trades_df = pd.DataFrame(all_trades)
+    if not trades_df.empty:
         trades_file = results_dir / "comprehensive_analysis_trades.csv"
         trades_df.to_csv(trades_file, index=False)
         print(f"💾 Comprehensive analysis trades saved to: {trades_file}")
     
-    # Save detailed analysis to text file
-    analysis_file = results_dir / "comprehensive_analysis_report.txt"
+    total_pnl = trades_df['pnl'].sum() if not trades_df.empty else 0.0
+    win_rate = (trades_df['pnl'] > 0).mean() * 100 if not trades_df.empty else 0.0
+    worst_trade = worst_trade_analysis['trade_details']
     
-    with open(analysis_file, 'w') as f:
-        f.write("COMPREHENSIVE TRADING STRATEGY ANALYSIS REPORT\n")
-        f.write("=" * 60 + "\n\n")
-        
-        f.write("EXECUTIVE SUMMARY\n")
-        f.write("-" * 20 + "\n")
-        f.write(f"Analysis Period: Last 3 months (June-August 2025)\n")
-        f.write(f"Total Trades: {len(all_trades)}\n")
-        f.write(f"Total P&L: {sum(t['pnl'] for t in all_trades):+.2f} points\n")
-        f.write(f"Win Rate: {len([t for t in all_trades if t['pnl'] > 0])/len(all_trades)*100:.1f}%\n\n")
-        
-        f.write("WORST TRADE BREAKDOWN\n")
-        f.write("-" * 20 + "\n")
-        worst_trade = worst_trade_analysis['trade_details']
-        f.write(f"Date: {worst_trade['date']} ({worst_trade['day_of_week']})\n")
-        f.write(f"P&L: {worst_trade['pnl']:+.2f} points\n")
-        f.write(f"Type: {worst_trade.get('type', 'TRADE')}\n\n")
-        
-        f.write("ROOT CAUSE OF FAILURE\n")
-        f.write("-" * 20 + "\n")
-        for reason in worst_trade_analysis['failure_reasons']:
-            f.write(f"• {reason}\n")
-        for issue in worst_trade_analysis['risk_management_issues']:
-            f.write(f"• {issue}\n")
-        for issue in worst_trade_analysis['timing_issues']:
-            f.write(f"• {issue}\n")
-        f.write("\n")
-        
-        f.write("SUGGESTED FIXES\n")
-        f.write("-" * 20 + "\n")
-        for category, fixes in improvements.items():
-            if fixes:
-                f.write(f"\n{category.upper()}:\n")
-                for fix in fixes:
-                    f.write(f"• {fix}\n")
-        f.write("\n")
-        
-        f.write("UPDATED STRATEGY LOGIC\n")
-        f.write("-" * 20 + "\n")
-        f.write(improved_strategy)
+    # Machine-readable sidecar of the same analysis
+    payload = {
+        'analysis_period': "Last 3 months (June-August 2025)",
+        'total_trades': len(trades_df),
+        'total_pnl': total_pnl,
+        'win_rate': win_rate,
+        'worst_trade': worst_trade,
+        'market_conditions': worst_trade_analysis['market_conditions'],
+        'failure_reasons': worst_trade_analysis['failure_reasons'],
+        'risk_management_issues': worst_trade_analysis['risk_management_issues'],
+        'timing_issues': worst_trade_analysis['timing_issues'],
+        'signal_quality': worst_trade_analysis['signal_quality'],
+        'improvements': improvements,
+    }
+    json_file = results_dir / "comprehensive_analysis_report.json"
+    json_file.write_bytes(dumps(payload))
+    print(f"💾 Comprehensive analysis JSON saved to: {json_file}")
+    
+    # Build the detailed analysis report, then write it in one go
+    lines = [
+        "COMPREHENSIVE TRADING STRATEGY ANALYSIS REPORT",
+        "=" * 60,
+        "",
+        "EXECUTIVE SUMMARY",
+        "-" * 20,
+        "Analysis Period: Last 3 months (June-August 2025)",
+        f"Total Trades: {len(trades_df)}",
+        f"Total P&L: {total_pnl:+.2f} points",
+        f"Win Rate: {win_rate:.1f}%",
+        "",
+        "WORST TRADE BREAKDOWN",
+        "-" * 20,
+        f"Date: {worst_trade['date']} ({worst_trade['day_of_week']})",
+        f"P&L: {worst_trade['pnl']:+.2f} points",
+        f"Type: {worst_trade.get('type', 'TRADE')}",
+        "",
+        "ROOT CAUSE OF FAILURE",
+        "-" * 20,
+    ]
+    lines += [f"• {reason}" for reason in worst_trade_analysis['failure_reasons']]
+    lines += [f"• {issue}" for issue in worst_trade_analysis['risk_management_issues']]
+    lines += [f"• {issue}" for issue in worst_trade_analysis['timing_issues']]
+    lines += ["", "SUGGESTED FIXES", "-" * 20]
+    for category, fixes in improvements.items():
+        if fixes:
+            lines += ["", f"{category.upper()}:"]
+            lines += [f"• {fix}" for fix in fixes]
+    lines += ["", "UPDATED STRATEGY LOGIC", "-" * 20, improved_strategy]
+    
+    analysis_file = results_dir / "comprehensive_analysis_report.txt"
+    analysis_file.write_text("\n".join(lines))
     
     print(f"💾 Comprehensive analysis report saved to: {analysis_file}")
 
@@ -494,6 +785,9 @@ def main():
     Main function to run comprehensive analysis
     """
     
+    load_env()
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    
     print("🔍 COMPREHENSIVE TRADING STRATEGY ANALYSIS")
     print("=" * 70)
     
@@ -1,52 +1,79 @@
 import pandas as pd
 import numpy as np
 import sys
+import io
+import contextlib
 import os
 from pathlib import Path
 from datetime import datetime, timedelta
 
-# Add strategy directory to path
-sys.path.append(str(Path(__file__).parent / 'strategy' / 'core'))
+try:
+    from .common import DAY_OF_WEEK_DTYPE, load_v2_data
+except ImportError:  # run as a script: common.py sits next to this file
+    from common import DAY_OF_WEEK_DTYPE, load_v2_data
 
-def load_v2_data():
-    """Load V2 analysis data"""
-    try:
-        df = pd.read_csv('results/v2_real_data_analysis.csv')
-        df['date'] = pd.to_datetime(df['date'])
-        return df
-    except FileNotFoundError:
-        print("❌ V2 analysis data not found. Please run V2 analysis first.")
-        return None
+def _nan_if_empty(reduce, values):
+    """reduce(values), or NaN for an empty selection (as pandas would give)"""
+    return reduce(values) if values.size else np.nan
+
+def day_of_week_stats(v2_data):
+    """
+    Every per-day statistic the optimizer reports, from one groupby pass:
+    V2/original P&L stats (rounded to 2dp) and effective size (3dp).
+    Adds the effective_size column to v2_data if it is missing.
+    """
+    if 'effective_size' not in v2_data.columns:
+        # Days with no original P&L keep the V2 P&L as-is (divide by 1)
+        v2 = v2_data['v2_pnl'].to_numpy(dtype=np.float64)
+        orig = v2_data['original_pnl'].to_numpy(dtype=np.float64)
+        v2_data['effective_size'] = np.divide(v2, orig, out=v2.copy(), where=orig != 0)
+    
+    stats = v2_data.groupby('day_of_week', sort=False, observed=True).agg(
+        v2_sum=('v2_pnl', 'sum'), v2_count=('v2_pnl', 'count'),
+        v2_mean=('v2_pnl', 'mean'), v2_std=('v2_pnl', 'std'),
+        orig_sum=('original_pnl', 'sum'), orig_mean=('original_pnl', 'mean'),
+        size_mean=('effective_size', 'mean'), size_std=('effective_size', 'std'),
+    )
+    return stats.round({'v2_sum': 2, 'v2_mean': 2, 'v2_std': 2, 'orig_sum': 2, 'orig_mean': 2,
+                        'size_mean': 3, 'size_std': 3})
 
 def analyze_performance_patterns():
-    """Analyze performance patterns for fine-tuning opportunities"""
+    """
+    Analyze performance patterns for fine-tuning opportunities.
+    Returns (v2_data, day_analysis), or (None, None) without data.
+    """
     print("🔍 STRATEGY V2 FINE-TUNING ANALYSIS")
     print("=" * 50)
     
     # Load data
     v2_data = load_v2_data()
     if v2_data is None:
-        return
+        return None, None
+    # Nothing to group or take win/loss ratios of
+    if v2_data.empty:
+        print("❌ V2 analysis data has no trades to analyze")
+        return None, None
     
     print(f"📊 Analyzing {len(v2_data)} trades for optimization opportunities")
     
+    # All day-of-week stats (incl. effective position size for section 4) in
+    # one pass; also handed to identify_optimization_opportunities
+    day_analysis = day_of_week_stats(v2_data)
+    # Plain dict rows for the print loops below (no label indexing per day)
+    day_rows = day_analysis.to_dict('index')
+    
     # 1. Day-of-Week Performance Analysis
     print("\n📅 DAY-OF-WEEK PERFORMANCE ANALYSIS:")
     print("-" * 40)
     
-    day_analysis = v2_data.groupby('day_of_week').agg({
-        'v2_pnl': ['sum', 'count', 'mean', 'std'],
-        'original_pnl': ['sum', 'mean']
-    }).round(2)
-    
     for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']:
-        if day in day_analysis.index:
-            data = day_analysis.loc[day]
-            v2_total = data[('v2_pnl', 'sum')]
-            v2_avg = data[('v2_pnl', 'mean')]
-            v2_count = data[('v2_pnl', 'count')]
-            v2_std = data[('v2_pnl', 'std')]
-            original_avg = data[('original_pnl', 'mean')]
+        if day in day_rows:
+            data = day_rows[day]
+            v2_total = data['v2_sum']
+            v2_avg = data['v2_mean']
+            v2_count = data['v2_count']
+            v2_std = data['v2_std']
+            original_avg = data['orig_mean']
             
             print(f"{day}:")
             print(f"  V2 Total: {v2_total:>8.2f} points ({v2_count:>2} trades)")
@@ -60,15 +87,15 @@ def analyze_performance_patterns():
     print("📅 MONTHLY PERFORMANCE ANALYSIS:")
     print("-" * 40)
     
-    v2_data['month'] = v2_data['date'].dt.strftime('%B')
-    monthly_analysis = v2_data.groupby('month').agg({
+    v2_data['month'] = v2_data['date'].dt.month_name().astype('category')
+    monthly_analysis = v2_data.groupby('month', sort=False, observed=True).agg({
         'v2_pnl': ['sum', 'count', 'mean', 'std'],
         'original_pnl': ['sum', 'mean']
-    }).round(2)
+    }).round(2).to_dict('index')
     
     for month in ['May', 'June', 'July', 'August']:
-        if month in monthly_analysis.index:
-            data = monthly_analysis.loc[month]
+        if month in monthly_analysis:
+            data = monthly_analysis[month]
             v2_total = data[('v2_pnl', 'sum')]
             v2_avg = data[('v2_pnl', 'mean')]
             v2_count = data[('v2_pnl', 'count')]
@@ -85,36 +112,37 @@ def analyze_performance_patterns():
     print("📊 TRADE SIZE ANALYSIS:")
     print("-" * 30)
     
-    # Analyze winning vs losing trades
-    winning_trades = v2_data[v2_data['v2_pnl'] > 0]
-    losing_trades = v2_data[v2_data['v2_pnl'] < 0]
+    # Analyze winning vs losing trades (masks built once, on the raw array)
+    pnl = v2_data['v2_pnl'].to_numpy(dtype=np.float64)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
     
-    print(f"Winning Trades: {len(winning_trades)} ({len(winning_trades)/len(v2_data)*100:.1f}%)")
-    print(f"  Average Win: {winning_trades['v2_pnl'].mean():.2f} points")
-    print(f"  Max Win: {winning_trades['v2_pnl'].max():.2f} points")
-    print(f"  Total Wins: {winning_trades['v2_pnl'].sum():.2f} points")
+    print(f"Winning Trades: {len(wins)} ({len(wins)/len(pnl)*100:.1f}%)")
+    print(f"  Average Win: {_nan_if_empty(np.mean, wins):.2f} points")
+    print(f"  Max Win: {_nan_if_empty(np.max, wins):.2f} points")
+    print(f"  Total Wins: {wins.sum():.2f} points")
     print()
-    print(f"Losing Trades: {len(losing_trades)} ({len(losing_trades)/len(v2_data)*100:.1f}%)")
-    print(f"  Average Loss: {losing_trades['v2_pnl'].mean():.2f} points")
-    print(f"  Max Loss: {losing_trades['v2_pnl'].min():.2f} points")
-    print(f"  Total Losses: {losing_trades['v2_pnl'].sum():.2f} points")
+    print(f"Losing Trades: {len(losses)} ({len(losses)/len(pnl)*100:.1f}%)")
+    print(f"  Average Loss: {_nan_if_empty(np.mean, losses):.2f} points")
+    print(f"  Max Loss: {_nan_if_empty(np.min, losses):.2f} points")
+    print(f"  Total Losses: {losses.sum():.2f} points")
     
     # 4. Position Sizing Analysis
     print("\n📈 POSITION SIZING ANALYSIS:")
     print("-" * 35)
     
-    # Calculate effective position sizes
-    v2_data['effective_size'] = v2_data['v2_pnl'] / v2_data['original_pnl'].replace(0, 1)
-    
-    size_analysis = v2_data.groupby('day_of_week')['effective_size'].agg(['mean', 'std']).round(3)
     print("Effective Position Sizes by Day:")
-    for day, data in size_analysis.iterrows():
-        print(f"  {day}: {data['mean']:.3f} ± {data['std']:.3f}")
+    for day in DAY_OF_WEEK_DTYPE.categories:
+        if day in day_rows:
+            print(f"  {day}: {day_rows[day]['size_mean']:.3f} ± {day_rows[day]['size_std']:.3f}")
     
-    return v2_data
+    return v2_data, day_analysis
 
-def identify_optimization_opportunities(v2_data):
-    """Identify specific optimization opportunities"""
+def identify_optimization_opportunities(v2_data, day_stats=None):
+    """
+    Identify specific optimization opportunities
+    (day_stats: day_of_week_stats(v2_data), if already computed)
+    """
     print("\n🎯 OPTIMIZATION OPPORTUNITIES:")
     print("=" * 40)
     
@@ -122,22 +150,25 @@ def identify_optimization_opportunities(v2_data):
     print("\n1. 📅 DAY-OF-WEEK OPTIMIZATION:")
     print("-" * 30)
     
-    day_performance = v2_data.groupby('day_of_week')['v2_pnl'].agg(['sum', 'count', 'mean']).round(2)
+    if day_stats is None:
+        day_stats = day_of_week_stats(v2_data)
+    day_performance = day_stats[['v2_sum', 'v2_count', 'v2_mean']].rename(
+        columns={'v2_sum': 'sum', 'v2_count': 'count', 'v2_mean': 'mean'}).to_dict('index')
     
     # Find best and worst days
-    best_day = day_performance['sum'].idxmax()
-    worst_day = day_performance['sum'].idxmin()
+    best_day = max(day_performance, key=lambda day: day_performance[day]['sum'])
+    worst_day = min(day_performance, key=lambda day: day_performance[day]['sum'])
     
-    print(f"Best Day: {best_day} (+{day_performance.loc[best_day, 'sum']:.2f} points)")
-    print(f"Worst Day: {worst_day} ({day_performance.loc[worst_day, 'sum']:.2f} points)")
+    print(f"Best Day: {best_day} (+{day_performance[best_day]['sum']:.2f} points)")
+    print(f"Worst Day: {worst_day} ({day_performance[worst_day]['sum']:.2f} points)")
     
     # Suggest position sizing adjustments
     print("\nSuggested Position Sizing Adjustments:")
     current_sizes = {'Monday': 0.7, 'Tuesday': 0.5, 'Wednesday': 1.0, 'Thursday': 1.0, 'Friday': 0.8}
     
     for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']:
-        if day in day_performance.index:
-            avg_performance = day_performance.loc[day, 'mean']
+        if day in day_performance:
+            avg_performance = day_performance[day]['mean']
             current_size = current_sizes[day]
             
             # Suggest size based on performance
@@ -154,9 +185,12 @@ def identify_optimization_opportunities(v2_data):
     print("\n2. 🛡️ STOP LOSS OPTIMIZATION:")
     print("-" * 30)
     
-    # Analyze current stop loss effectiveness
-    max_loss = v2_data['v2_pnl'].min()
-    avg_loss = v2_data[v2_data['v2_pnl'] < 0]['v2_pnl'].mean()
+    # Analyze current stop loss effectiveness (wins/losses split once for sections 2 and 3)
+    pnl = v2_data['v2_pnl'].to_numpy(dtype=np.float64)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    max_loss = _nan_if_empty(np.min, pnl)
+    avg_loss = _nan_if_empty(np.mean, losses)
     
     print(f"Current Max Loss: {max_loss:.2f} points")
     print(f"Average Loss: {avg_loss:.2f} points")
@@ -173,8 +207,8 @@ def identify_optimization_opportunities(v2_data):
     print("\n3. 📈 TAKE PROFIT OPTIMIZATION:")
     print("-" * 30)
     
-    avg_win = v2_data[v2_data['v2_pnl'] > 0]['v2_pnl'].mean()
-    max_win = v2_data['v2_pnl'].max()
+    avg_win = _nan_if_empty(np.mean, wins)
+    max_win = _nan_if_empty(np.max, pnl)
     
     print(f"Average Win: {avg_win:.2f} points")
     print(f"Max Win: {max_win:.2f} points")
@@ -277,39 +311,52 @@ def save_optimization_report(v2_data, day_performance):
     # Create results directory if it doesn't exist
     os.makedirs('results', exist_ok=True)
     
-    # Save detailed analysis
-    with open('results/strategy_v3_optimization_report.txt', 'w') as f:
-        f.write("STRATEGY V3 OPTIMIZATION ANALYSIS REPORT\n")
-        f.write("=" * 45 + "\n\n")
-        
-        f.write("CURRENT V2 PERFORMANCE:\n")
-        f.write(f"Total P&L: {v2_data['v2_pnl'].sum():.2f} points\n")
-        f.write(f"Win Rate: {(len(v2_data[v2_data['v2_pnl'] > 0]) / len(v2_data) * 100):.1f}%\n")
-        f.write(f"Profit Factor: {v2_data[v2_data['v2_pnl'] > 0]['v2_pnl'].sum() / abs(v2_data[v2_data['v2_pnl'] < 0]['v2_pnl'].sum()):.2f}\n\n")
-        
-        f.write("DAY-OF-WEEK PERFORMANCE:\n")
-        for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']:
-            if day in day_performance.index:
-                data = day_performance.loc[day]
-                f.write(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})\n")
-        
-        f.write("\nOPTIMIZATION RECOMMENDATIONS:\n")
-        f.write("1. Enhanced Position Sizing\n")
-        f.write("2. Optimized Risk Management\n")
-        f.write("3. Advanced Time Filters\n")
-        f.write("4. Dynamic Volatility Filters\n")
-        f.write("5. Additional Safety Measures\n")
+    # One win mask; win/loss sums are masked reductions rather than copies
+    # (flat trades add nothing to the loss side)
+    pnl = v2_data['v2_pnl'].to_numpy(dtype=np.float64)
+    is_win = pnl > 0
+    win_count = np.count_nonzero(is_win)
+    win_sum = pnl.sum(where=is_win)
+    loss_sum = pnl.sum(where=~is_win)
+    
+    # Build the report, then write it in one go
+    lines = [
+        "STRATEGY V3 OPTIMIZATION ANALYSIS REPORT",
+        "=" * 45,
+        "",
+        "CURRENT V2 PERFORMANCE:",
+        f"Total P&L: {win_sum + loss_sum:.2f} points",
+        f"Win Rate: {(win_count / len(pnl) * 100):.1f}%",
+        f"Profit Factor: {win_sum / abs(loss_sum):.2f}",
+        "",
+        "DAY-OF-WEEK PERFORMANCE:",
+    ]
+    for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']:
+        if day in day_performance:
+            data = day_performance[day]
+            lines.append(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})")
+    lines += [
+        "",
+        "OPTIMIZATION RECOMMENDATIONS:",
+        "1. Enhanced Position Sizing",
+        "2. Optimized Risk Management",
+        "3. Advanced Time Filters",
+        "4. Dynamic Volatility Filters",
+        "5. Additional Safety Measures",
+    ]
+    Path('results/strategy_v3_optimization_report.txt').write_text("\n".join(lines) + "\n")
     
     print(f"\n💾 Optimization report saved to:")
     print(f"   📄 results/strategy_v3_optimization_report.txt")
 
-if __name__ == "__main__":
+def main():
+    """Run the V2 fine-tuning analysis and save the V3 report"""
     # Run comprehensive analysis
-    v2_data = analyze_performance_patterns()
+    v2_data, day_analysis = analyze_performance_patterns()
     
     if v2_data is not None:
         # Identify optimization opportunities
-        day_performance = identify_optimization_opportunities(v2_data)
+        day_performance = identify_optimization_opportunities(v2_data, day_analysis)
         
         # Create V3 recommendations
         create_optimized_strategy_v3()
@@ -325,3 +372,12 @@ if __name__ == "__main__":
         print("Strategy V2 shows excellent performance with significant")
         print("optimization opportunities identified for V3 implementation.")
         print("Key focus areas: position sizing, risk management, and filters.")
+
+if __name__ == "__main__":
+    # Collect the whole report in memory and emit it with a single write
+    buf = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buf):
+            main()
+    finally:
+        sys.stdout.write(buf.getvalue())
@@ -1,5 +1,8 @@
 import pandas as pd
+import numpy as np
 import sys
+import io
+import contextlib
 import os
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -10,54 +13,72 @@ sys.path.append(str(Path(__file__).parent / 'strategy' / 'core'))
 
 from ub_lb_v2 import run_floating_band_strategy_v2
 from ub_lb_v3 import run_floating_band_strategy_v3
+try:
+    from .common import DAY_OF_WEEK_DTYPE, load_v2_data, simulate_sized_pnl
+except ImportError:  # run as a script: common.py sits next to this file
+    from common import DAY_OF_WEEK_DTYPE, load_v2_data, simulate_sized_pnl
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_existing_data():
-    """Load the existing trade data for July-August analysis"""
-    try:
-        df = pd.read_csv('results/jan_to_august_trades.csv')
-        df['date'] = pd.to_datetime(df['date'])
-        return df
-    except FileNotFoundError:
-        print("❌ No existing data found. Please run the original strategy first.")
-        return None
+LOT_SIZE = 15       # ₹ per point
+CAPITAL = 100000    # ₹1 lakh
+
+def roi_pct(points):
+    """Return on CAPITAL, in %, of a P&L in points."""
+    return points * LOT_SIZE / CAPITAL * 100
+
+# V3 size relative to V2, by day (Monday 0.7 -> 0.8, Tuesday 0.5 -> 0.4,
+# Thursday 1.0 -> 1.2, Friday 0.8 -> 0.9); other days keep their V2 size
+V3_SIZE_MULTIPLIER = {'Monday': 0.8 / 0.7, 'Tuesday': 0.4 / 0.5, 'Wednesday': 1.0,
+                      'Thursday': 1.2 / 1.0, 'Friday': 0.9 / 0.8}
+
+def simulate_v3_pnl(v2_pnl, day_codes, date_codes, stop_loss=45.0, daily_limit=120.0):
+    """
+    V3 P&L from V2 P&L as flat arrays: day-of-week resize (by category code),
+    per-trade stop-loss clip, then scale each day whose total breaches the
+    daily loss limit back to exactly -daily_limit. date_codes are 0..D-1.
+    """
+    _, v3_pnl = simulate_sized_pnl(v2_pnl, day_codes, date_codes, V3_SIZE_MULTIPLIER,
+                                   stop_loss, daily_limit, stop_after_sizing=True)
+    return v3_pnl
 
 def simulate_v3_performance_on_july_august():
     """Simulate V3 strategy performance on July-August real data"""
     print("🔍 STRATEGY V3 - JULY & AUGUST REAL DATA ANALYSIS")
     print("=" * 55)
     
-    # Load existing data
-    existing_data = load_existing_data()
-    if existing_data is None:
+    # Load V2 data from the real data analysis (it carries every trade, so
+    # the original trades CSV doesn't need reading as well)
+    v2_data = load_v2_data()
+    if v2_data is None:
         return
     
-    # Filter for July and August only
-    july_august_data = existing_data[
-        (existing_data['date'].dt.month == 7) | (existing_data['date'].dt.month == 8)
-    ].copy()
+    # Month numbers extracted once; July/August rows found by range check
+    month = v2_data['date'].dt.month.to_numpy()
+    july_august = (month >= 7) & (month <= 8)
+    v2_july_august = v2_data[july_august]
+    is_july = month[july_august] == 7
+    
+    if v2_july_august.empty:
+        print("❌ No July-August trades in the V2 analysis data")
+        return None
     
-    print(f"📊 Analyzing {len(july_august_data)} trades from July-August 2025")
+    print(f"📊 Analyzing {len(v2_july_august)} trades from July-August 2025")
     
     # V2 Performance (from existing analysis)
     print("\n📈 STRATEGY V2 PERFORMANCE (July-August):")
     print("-" * 40)
     
-    # Load V2 data from the real data analysis
-    v2_data = pd.read_csv('results/v2_real_data_analysis.csv')
-    v2_data['date'] = pd.to_datetime(v2_data['date'])
-    v2_july_august = v2_data[(v2_data['date'].dt.month == 7) | (v2_data['date'].dt.month == 8)]
-    
-    v2_july = v2_july_august[v2_july_august['date'].dt.month == 7]['v2_pnl'].sum()
-    v2_august = v2_july_august[v2_july_august['date'].dt.month == 8]['v2_pnl'].sum()
+    v2_pnl = v2_july_august['v2_pnl'].to_numpy()
+    v2_july = v2_pnl[is_july].sum()
+    v2_august = v2_pnl[~is_july].sum()
     v2_total = v2_july + v2_august
     
-    print(f"July V2 P&L: {v2_july:.2f} points (₹{v2_july * 15:.2f})")
-    print(f"August V2 P&L: {v2_august:.2f} points (₹{v2_august * 15:.2f})")
-    print(f"Total V2 P&L: {v2_total:.2f} points (₹{v2_total * 15:.2f})")
+    print(f"July V2 P&L: {v2_july:.2f} points (₹{v2_july * LOT_SIZE:.2f})")
+    print(f"August V2 P&L: {v2_august:.2f} points (₹{v2_august * LOT_SIZE:.2f})")
+    print(f"Total V2 P&L: {v2_total:.2f} points (₹{v2_total * LOT_SIZE:.2f})")
     
     # Simulate V3 improvements
     print("\n🚀 STRATEGY V3 SIMULATION (July-August):")
@@ -66,46 +87,24 @@ def simulate_v3_performance_on_july_august():
     # Apply V3 optimizations to existing data
     v3_simulation = v2_july_august.copy()
     
-    # 1. Enhanced Position Sizing (V3 optimizations)
-    def apply_v3_position_sizing(row):
-        day = row['day_of_week']
-        v2_pnl = row['v2_pnl']
-        
-        # V3 position sizing
-        if day == 'Monday':
-            return v2_pnl * (0.8 / 0.7)  # Increased from 0.7 to 0.8
-        elif day == 'Tuesday':
-            return v2_pnl * (0.4 / 0.5)  # Decreased from 0.5 to 0.4
-        elif day == 'Thursday':
-            return v2_pnl * (1.2 / 1.0)  # Increased from 1.0 to 1.2
-        elif day == 'Friday':
-            return v2_pnl * (0.9 / 0.8)  # Increased from 0.8 to 0.9
-        else:
-            return v2_pnl * 1.0  # Maintained
-    
-    v3_simulation['v3_pnl'] = v3_simulation.apply(apply_v3_position_sizing, axis=1)
-    
-    # 2. Apply V3 stop loss (45 points instead of 50)
-    v3_simulation['v3_pnl'] = v3_simulation['v3_pnl'].apply(lambda x: max(x, -45))
-    
-    # 3. Apply V3 daily loss limit (120 points instead of 150)
-    for date in v3_simulation['date'].unique():
-        daily_data = v3_simulation[v3_simulation['date'] == date]
-        daily_total = daily_data['v3_pnl'].sum()
-        
-        if daily_total < -120:  # V3 daily loss limit
-            reduction_factor = -120 / daily_total
-            v3_simulation.loc[v3_simulation['date'] == date, 'v3_pnl'] = \
-                v3_simulation.loc[v3_simulation['date'] == date, 'v3_pnl'] * reduction_factor
+    # 1. Enhanced position sizing, 2. stop loss at 45 points (was 50) and
+    # 3. daily loss limit of 120 points (was 150), in one pass over the arrays.
+    # Both keys go in as narrow categorical codes rather than strings/datetime64
+    day_codes = v3_simulation['day_of_week'].astype(DAY_OF_WEEK_DTYPE).cat.codes.to_numpy()
+    date_codes = pd.Categorical(v3_simulation['date']).codes
+    v3_simulation['v3_pnl'] = simulate_v3_pnl(
+        v3_simulation['v2_pnl'].to_numpy(dtype=np.float64), day_codes, date_codes
+    )
     
     # Calculate V3 performance
-    v3_july = v3_simulation[v3_simulation['date'].dt.month == 7]['v3_pnl'].sum()
-    v3_august = v3_simulation[v3_simulation['date'].dt.month == 8]['v3_pnl'].sum()
+    v3_pnl = v3_simulation['v3_pnl'].to_numpy()
+    v3_july = v3_pnl[is_july].sum()
+    v3_august = v3_pnl[~is_july].sum()
     v3_total = v3_july + v3_august
     
-    print(f"July V3 P&L: {v3_july:.2f} points (₹{v3_july * 15:.2f})")
-    print(f"August V3 P&L: {v3_august:.2f} points (₹{v3_august * 15:.2f})")
-    print(f"Total V3 P&L: {v3_total:.2f} points (₹{v3_total * 15:.2f})")
+    print(f"July V3 P&L: {v3_july:.2f} points (₹{v3_july * LOT_SIZE:.2f})")
+    print(f"August V3 P&L: {v3_august:.2f} points (₹{v3_august * LOT_SIZE:.2f})")
+    print(f"Total V3 P&L: {v3_total:.2f} points (₹{v3_total * LOT_SIZE:.2f})")
     
     # Improvement metrics
     july_improvement = v3_july - v2_july
@@ -114,44 +113,45 @@ def simulate_v3_performance_on_july_august():
     
     print(f"\n📊 IMPROVEMENT METRICS:")
     print("-" * 25)
-    print(f"July Improvement: {july_improvement:+.2f} points (₹{july_improvement * 15:+.2f})")
-    print(f"August Improvement: {august_improvement:+.2f} points (₹{august_improvement * 15:+.2f})")
-    print(f"Total Improvement: {total_improvement:+.2f} points (₹{total_improvement * 15:+.2f})")
+    print(f"July Improvement: {july_improvement:+.2f} points (₹{july_improvement * LOT_SIZE:+.2f})")
+    print(f"August Improvement: {august_improvement:+.2f} points (₹{august_improvement * LOT_SIZE:+.2f})")
+    print(f"Total Improvement: {total_improvement:+.2f} points (₹{total_improvement * LOT_SIZE:+.2f})")
     print(f"Improvement Percentage: {(total_improvement / v2_total * 100):+.1f}%")
     
     # Day-by-day breakdown
     print(f"\n📅 DAY-BY-DAY BREAKDOWN (V3):")
     print("-" * 35)
     
-    day_analysis_v3 = v3_simulation.groupby('day_of_week')['v3_pnl'].agg(['sum', 'count', 'mean']).round(2)
-    for day, data in day_analysis_v3.iterrows():
+    day_analysis_v3 = v3_simulation.groupby('day_of_week', observed=True)['v3_pnl'].agg(['sum', 'count', 'mean']).round(2)
+    for day, data in day_analysis_v3.to_dict('index').items():
         print(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})")
     
     # Monthly breakdown
     print(f"\n📅 MONTHLY BREAKDOWN (V3):")
     print("-" * 30)
     
-    v3_simulation['month'] = v3_simulation['date'].dt.strftime('%B')
-    monthly_v3 = v3_simulation.groupby('month')['v3_pnl'].agg(['sum', 'count']).round(2)
+    v3_simulation['month'] = v3_simulation['date'].dt.month_name().astype('category')
+    monthly_v3 = v3_simulation.groupby('month', observed=True)['v3_pnl'].agg(['sum', 'count']).round(2)
     
-    for month, data in monthly_v3.iterrows():
+    for month, data in monthly_v3.to_dict('index').items():
         print(f"{month}: {data['sum']:>8.2f} points ({data['count']:>2} trades)")
     
     # Risk metrics comparison
     print(f"\n⚠️ RISK METRICS COMPARISON:")
     print("-" * 30)
     
-    max_loss_v2 = v2_july_august['v2_pnl'].min()
-    max_loss_v3 = v3_simulation['v3_pnl'].min()
+    max_loss_v2 = v2_pnl.min()
+    max_loss_v3 = v3_pnl.min()
     
     print(f"Maximum Single Trade Loss:")
     print(f"  V2: {max_loss_v2:.2f} points")
     print(f"  V3: {max_loss_v3:.2f} points")
     print(f"  Improvement: {max_loss_v3 - max_loss_v2:+.2f} points")
     
-    # Daily loss analysis
-    daily_losses_v2 = v2_july_august.groupby('date')['v2_pnl'].sum()
-    daily_losses_v3 = v3_simulation.groupby('date')['v3_pnl'].sum()
+    # Daily loss analysis (per-day totals from the same date codes the
+    # simulation used)
+    daily_losses_v2 = np.bincount(date_codes, weights=v2_pnl)
+    daily_losses_v3 = np.bincount(date_codes, weights=v3_pnl)
     
     worst_day_v2 = daily_losses_v2.min()
     worst_day_v3 = daily_losses_v3.min()
@@ -165,8 +165,8 @@ def simulate_v3_performance_on_july_august():
     print(f"\n📈 PERFORMANCE METRICS:")
     print("-" * 25)
     
-    winning_trades_v3 = len(v3_simulation[v3_simulation['v3_pnl'] > 0])
-    total_trades_v3 = len(v3_simulation)
+    winning_trades_v3 = int(np.count_nonzero(v3_pnl > 0))
+    total_trades_v3 = len(v3_pnl)
     win_rate_v3 = (winning_trades_v3 / total_trades_v3 * 100) if total_trades_v3 > 0 else 0
     
     print(f"V3 Win Rate: {win_rate_v3:.1f}%")
@@ -175,11 +175,8 @@ def simulate_v3_performance_on_july_august():
     print(f"V3 Losing Trades: {total_trades_v3 - winning_trades_v3}")
     
     # ROI calculation
-    capital = 100000  # ₹1 lakh
-    v2_return = capital + (v2_total * 15)
-    v3_return = capital + (v3_total * 15)
-    v2_roi = ((v2_return - capital) / capital) * 100
-    v3_roi = ((v3_return - capital) / capital) * 100
+    v2_roi = roi_pct(v2_total)
+    v3_roi = roi_pct(v3_total)
     
     print(f"\n💰 ROI COMPARISON:")
     print("-" * 20)
@@ -198,47 +195,57 @@ def save_v3_july_august_results(v2_data, v3_data, v2_total, v3_total):
     # Create results directory if it doesn't exist
     os.makedirs('results', exist_ok=True)
     
-    # Save detailed comparison
+    # Save detailed comparison (plain arrays: no index alignment on build,
+    # and the month names simulate already derived are reused)
+    v2_pnl = v2_data['v2_pnl'].to_numpy()
+    v3_pnl = v3_data['v3_pnl'].to_numpy()
     comparison_data = pd.DataFrame({
-        'date': v2_data['date'],
-        'day_of_week': v2_data['day_of_week'],
-        'month': v2_data['date'].dt.strftime('%B'),
-        'v2_pnl': v2_data['v2_pnl'],
-        'v3_pnl': v3_data['v3_pnl'],
-        'improvement': v3_data['v3_pnl'] - v2_data['v2_pnl']
-    })
+        'date': v2_data['date'].to_numpy(),
+        'day_of_week': v2_data['day_of_week'].to_numpy(),
+        'month': v3_data['month'].to_numpy(),
+        'v2_pnl': v2_pnl,
+        'v3_pnl': v3_pnl,
+        'improvement': v3_pnl - v2_pnl
+    }, copy=False)
     
     comparison_data.to_csv('results/v3_july_august_comparison.csv', index=False)
     
-    # Save summary report
-    with open('results/v3_july_august_summary.txt', 'w') as f:
-        f.write("STRATEGY V3 - JULY & AUGUST REAL DATA ANALYSIS\n")
-        f.write("=" * 50 + "\n\n")
-        
-        f.write("STRATEGY V2 PERFORMANCE:\n")
-        f.write(f"Total P&L: {v2_total:.2f} points (₹{v2_total * 15:.2f})\n")
-        f.write(f"ROI: {((100000 + v2_total * 15 - 100000) / 100000 * 100):.2f}%\n\n")
-        
-        f.write("STRATEGY V3 PERFORMANCE:\n")
-        f.write(f"Total P&L: {v3_total:.2f} points (₹{v3_total * 15:.2f})\n")
-        f.write(f"ROI: {((100000 + v3_total * 15 - 100000) / 100000 * 100):.2f}%\n\n")
-        
-        f.write("IMPROVEMENTS:\n")
-        f.write(f"P&L Improvement: {v3_total - v2_total:+.2f} points (₹{(v3_total - v2_total) * 15:+.2f})\n")
-        f.write(f"Improvement Percentage: {((v3_total - v2_total) / v2_total * 100):+.1f}%\n")
-        f.write(f"ROI Improvement: {((100000 + v3_total * 15 - 100000) / 100000 * 100) - ((100000 + v2_total * 15 - 100000) / 100000 * 100):+.2f}%\n")
-        
-        # Day of week breakdown
-        f.write("\nDAY OF WEEK BREAKDOWN (V3):\n")
-        day_analysis_v3 = v3_data.groupby('day_of_week')['v3_pnl'].agg(['sum', 'count', 'mean']).round(2)
-        for day, data in day_analysis_v3.iterrows():
-            f.write(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})\n")
-        
-        # Monthly breakdown
-        f.write("\nMONTHLY BREAKDOWN (V3):\n")
-        monthly_v3 = v3_data.groupby('month')['v3_pnl'].agg(['sum', 'count']).round(2)
-        for month, data in monthly_v3.iterrows():
-            f.write(f"{month}: {data['sum']:>8.2f} points ({data['count']:>2} trades)\n")
+    v2_roi = roi_pct(v2_total)
+    v3_roi = roi_pct(v3_total)
+    total_improvement = v3_total - v2_total
+    
+    # Build the summary report, then write it in one go
+    lines = [
+        "STRATEGY V3 - JULY & AUGUST REAL DATA ANALYSIS",
+        "=" * 50,
+        "",
+        "STRATEGY V2 PERFORMANCE:",
+        f"Total P&L: {v2_total:.2f} points (₹{v2_total * LOT_SIZE:.2f})",
+        f"ROI: {v2_roi:.2f}%",
+        "",
+        "STRATEGY V3 PERFORMANCE:",
+        f"Total P&L: {v3_total:.2f} points (₹{v3_total * LOT_SIZE:.2f})",
+        f"ROI: {v3_roi:.2f}%",
+        "",
+        "IMPROVEMENTS:",
+        f"P&L Improvement: {total_improvement:+.2f} points (₹{total_improvement * LOT_SIZE:+.2f})",
+        f"Improvement Percentage: {(total_improvement / v2_total * 100):+.1f}%",
+        f"ROI Improvement: {v3_roi - v2_roi:+.2f}%",
+    ]
+    
+    # Day of week breakdown
+    lines += ["", "DAY OF WEEK BREAKDOWN (V3):"]
+    day_analysis_v3 = v3_data.groupby('day_of_week', observed=True)['v3_pnl'].agg(['sum', 'count', 'mean']).round(2)
+    for day, data in day_analysis_v3.to_dict('index').items():
+        lines.append(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})")
+    
+    # Monthly breakdown
+    lines += ["", "MONTHLY BREAKDOWN (V3):"]
+    monthly_v3 = v3_data.groupby('month', observed=True)['v3_pnl'].agg(['sum', 'count']).round(2)
+    for month, data in monthly_v3.to_dict('index').items():
+        lines.append(f"{month}: {data['sum']:>8.2f} points ({data['count']:>2} trades)")
+    
+    Path('results/v3_july_august_summary.txt').write_text("\n".join(lines) + "\n")
     
     print(f"\n💾 Results saved to:")
     print(f"   📄 results/v3_july_august_comparison.csv")
@@ -251,22 +258,24 @@ def analyze_v3_optimization_effectiveness(v3_data):
     
     # Position sizing effectiveness
     print("📅 Position Sizing Effectiveness:")
-    day_performance = v3_data.groupby('day_of_week')['v3_pnl'].agg(['sum', 'count', 'mean']).round(2)
+    day_performance = v3_data.groupby('day_of_week', sort=False, observed=True)['v3_pnl'].agg(['sum', 'count', 'mean']).round(2).to_dict('index')
     
     # Check if Thursday (best day) shows improvement
-    if 'Thursday' in day_performance.index:
-        thursday_performance = day_performance.loc['Thursday']
+    if 'Thursday' in day_performance:
+        thursday_performance = day_performance['Thursday']
         print(f"  Thursday (120% position): {thursday_performance['sum']:.2f} points")
     
     # Check if Tuesday (worst day) shows improvement
-    if 'Tuesday' in day_performance.index:
-        tuesday_performance = day_performance.loc['Tuesday']
+    if 'Tuesday' in day_performance:
+        tuesday_performance = day_performance['Tuesday']
         print(f"  Tuesday (40% position): {tuesday_performance['sum']:.2f} points")
     
     # Risk management effectiveness
     print("\n🛡️ Risk Management Effectiveness:")
-    max_loss = v3_data['v3_pnl'].min()
-    avg_loss = v3_data[v3_data['v3_pnl'] < 0]['v3_pnl'].mean()
+    pnl = v3_data['v3_pnl'].to_numpy()
+    losses = pnl[pnl < 0]
+    max_loss = pnl.min()
+    avg_loss = losses.mean() if losses.size else np.nan
     
     print(f"  Maximum Loss: {max_loss:.2f} points (target: -45)")
     print(f"  Average Loss: {avg_loss:.2f} points")
@@ -288,7 +297,8 @@ def analyze_v3_optimization_effectiveness(v3_data):
     print("  Enhanced volume filter (1.2x)")
     print("  Stronger trend strength (R² > 0.4)")
 
-if __name__ == "__main__":
+def main():
+    """Run the V3 July-August validation"""
     # Run V3 analysis on July-August data
     v3_results = simulate_v3_performance_on_july_august()
     
@@ -301,3 +311,12 @@ if __name__ == "__main__":
         print("Strategy V3 shows improved performance over V2")
         print("for July-August 2025 with enhanced risk management")
         print("and optimized position sizing based on day performance.")
+
+if __name__ == "__main__":
+    # Collect the whole report in memory and emit it with a single write
+    buf = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buf):
+            main()
+    finally:
+        sys.stdout.write(buf.getvalue())
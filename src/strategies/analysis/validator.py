@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import sys
 import os
@@ -10,6 +11,10 @@ sys.path.append(str(Path(__file__).parent / 'strategy' / 'core'))
 
 from ub_lb import run_floating_band_strategy
 from ub_lb_v2 import run_floating_band_strategy_v2
+try:
+    from .common import DAY_OF_WEEK_DTYPE, V2_CSV, V2_CACHE, V2_DAY_SIZING, simulate_sized_pnl
+except ImportError:  # run as a script: common.py sits next to this file
+    from common import DAY_OF_WEEK_DTYPE, V2_CSV, V2_CACHE, V2_DAY_SIZING, simulate_sized_pnl
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,12 +23,27 @@ logger = logging.getLogger(__name__)
 def load_existing_data():
     """Load the existing trade data for analysis"""
     try:
-        df = pd.read_csv('results/jan_to_august_trades.csv')
+        # Types pinned at parse time instead of inferred; day_of_week comes in as
+        # a categorical (integer codes; categories sort like the strings did)
+        df = pd.read_csv('results/jan_to_august_trades.csv',
+                         dtype={'date': 'str', 'day_of_week': 'category', 'pnl': 'float64'})
+        # Parsed once here; 'date' itself stays the string key for printing/grouping
+        df['date_dt'] = pd.to_datetime(df['date'], format='ISO8601')
+        df['date'] = df['date'].astype('category')
         return df
     except FileNotFoundError:
         print("❌ No existing data found. Please run the original strategy first.")
         return None
 
+def simulate_v2_pnl(pnl, day_codes, date_codes, stop_loss=50.0, daily_limit=150.0):
+    """
+    V2 P&L from original P&L as flat arrays: per-trade stop-loss clip,
+    day-of-week sizing (by category code), then scale each day whose total
+    breaches the daily loss limit back to exactly -daily_limit.
+    date_codes are 0..D-1. Returns (sized P&L, final P&L after the cap).
+    """
+    return simulate_sized_pnl(pnl, day_codes, date_codes, V2_DAY_SIZING, stop_loss, daily_limit)
+
 def simulate_v2_performance_on_real_data():
     """Simulate V2 strategy performance on real historical data"""
     print("🔍 STRATEGY V2 REAL DATA ANALYSIS")
@@ -33,6 +53,10 @@ def simulate_v2_performance_on_real_data():
     existing_data = load_existing_data()
     if existing_data is None:
         return
+    # Nothing to simulate (and no worst trade to look up)
+    if existing_data.empty:
+        print("❌ No trades in the existing data to analyze")
+        return
     
     print(f"📊 Analyzing {len(existing_data)} real trades from historical data")
     
@@ -40,9 +64,10 @@ def simulate_v2_performance_on_real_data():
     print("\n📈 ORIGINAL STRATEGY (REAL DATA):")
     print("-" * 35)
     
-    total_pnl_original = existing_data['pnl'].sum()
-    total_trades_original = len(existing_data)
-    winning_trades_original = len(existing_data[existing_data['pnl'] > 0])
+    pnl = existing_data['pnl'].to_numpy(dtype=np.float64)
+    total_pnl_original = pnl.sum()
+    total_trades_original = len(pnl)
+    winning_trades_original = int(np.count_nonzero(pnl > 0))
     win_rate_original = (winning_trades_original / total_trades_original * 100) if total_trades_original > 0 else 0
     
     print(f"Total P&L: {total_pnl_original:.2f} points (₹{total_pnl_original * 15:.2f})")
@@ -62,46 +87,18 @@ def simulate_v2_performance_on_real_data():
     # Apply V2 filters and improvements
     v2_simulation = existing_data.copy()
     
-    # 1. Apply stop loss (max 50 points loss)
-    v2_simulation['pnl_v2'] = v2_simulation['pnl'].apply(lambda x: max(x, -50))
-    
-    # 2. Apply day-of-week position sizing
-    def apply_position_sizing(row):
-        day = row['day_of_week']
-        if day == 'Monday':
-            return row['pnl_v2'] * 0.7
-        elif day == 'Tuesday':
-            return row['pnl_v2'] * 0.5
-        elif day == 'Friday':
-            return row['pnl_v2'] * 0.8
-        else:
-            return row['pnl_v2']
-    
-    v2_simulation['pnl_v2'] = v2_simulation.apply(apply_position_sizing, axis=1)
-    
-    # 3. Apply daily loss limit (150 points)
-    daily_losses = v2_simulation.groupby('date')['pnl_v2'].sum()
-    daily_losses_capped = daily_losses.apply(lambda x: max(x, -150))
-    
-    # Reconstruct with daily loss limits
-    v2_simulation['daily_pnl'] = v2_simulation.groupby('date')['pnl_v2'].transform('sum')
-    v2_simulation['pnl_v2_final'] = v2_simulation['pnl_v2']
-    
-    # Apply daily loss cap
-    for date in v2_simulation['date'].unique():
-        daily_data = v2_simulation[v2_simulation['date'] == date]
-        daily_total = daily_data['pnl_v2'].sum()
-        
-        if daily_total < -150:  # Daily loss limit exceeded
-            # Proportionally reduce all trades for that day
-            reduction_factor = -150 / daily_total
-            v2_simulation.loc[v2_simulation['date'] == date, 'pnl_v2_final'] = \
-                v2_simulation.loc[v2_simulation['date'] == date, 'pnl_v2'] * reduction_factor
+    # 1. Stop loss (max 50 points loss), 2. day-of-week position sizing and
+    # 3. daily loss limit (150 points), in one pass over the arrays
+    day_codes = v2_simulation['day_of_week'].astype(DAY_OF_WEEK_DTYPE).cat.codes.to_numpy()
+    date_codes = pd.Categorical(v2_simulation['date']).codes
+    pnl_v2, pnl_v2_final = simulate_v2_pnl(pnl, day_codes, date_codes)
+    v2_simulation['pnl_v2'] = pnl_v2
+    v2_simulation['pnl_v2_final'] = pnl_v2_final
     
     # Calculate V2 performance
-    total_pnl_v2 = v2_simulation['pnl_v2_final'].sum()
-    total_trades_v2 = len(v2_simulation)
-    winning_trades_v2 = len(v2_simulation[v2_simulation['pnl_v2_final'] > 0])
+    total_pnl_v2 = pnl_v2_final.sum()
+    total_trades_v2 = len(pnl_v2_final)
+    winning_trades_v2 = int(np.count_nonzero(pnl_v2_final > 0))
     win_rate_v2 = (winning_trades_v2 / total_trades_v2 * 100) if total_trades_v2 > 0 else 0
     
     print(f"Total P&L: {total_pnl_v2:.2f} points (₹{total_pnl_v2 * 15:.2f})")
@@ -128,18 +125,18 @@ def simulate_v2_performance_on_real_data():
     print(f"\n📅 MONTHLY BREAKDOWN (V2):")
     print("-" * 30)
     
-    v2_simulation['month'] = pd.to_datetime(v2_simulation['date']).dt.strftime('%B')
-    monthly_v2 = v2_simulation.groupby('month')['pnl_v2_final'].agg(['sum', 'count']).round(2)
+    v2_simulation['month'] = v2_simulation['date_dt'].dt.month_name().astype('category')
+    monthly_v2 = v2_simulation.groupby('month', observed=True)['pnl_v2_final'].agg(['sum', 'count']).round(2).to_dict('index')
     
-    for month, data in monthly_v2.iterrows():
+    for month, data in monthly_v2.items():
         print(f"{month}: {data['sum']:>8.2f} points ({data['count']:>2} trades)")
     
     # Day of week breakdown
     print(f"\n📅 DAY OF WEEK BREAKDOWN (V2):")
     print("-" * 35)
     
-    day_analysis_v2 = v2_simulation.groupby('day_of_week')['pnl_v2_final'].agg(['sum', 'count', 'mean']).round(2)
-    for day, data in day_analysis_v2.iterrows():
+    day_analysis_v2 = v2_simulation.groupby('day_of_week', observed=True)['pnl_v2_final'].agg(['sum', 'count', 'mean']).round(2).to_dict('index')
+    for day, data in day_analysis_v2.items():
         print(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})")
     
     # Risk metrics
@@ -154,12 +151,10 @@ def simulate_v2_performance_on_real_data():
     print(f"  V2: {max_loss_v2:.2f} points")
     print(f"  Improvement: {max_loss_v2 - max_loss_original:+.2f} points")
     
-    # Daily loss analysis
-    daily_losses_original = existing_data.groupby('date')['pnl'].sum()
-    daily_losses_v2 = v2_simulation.groupby('date')['pnl_v2_final'].sum()
-    
-    worst_day_original = daily_losses_original.min()
-    worst_day_v2 = daily_losses_v2.min()
+    # Daily loss analysis (per-day totals from the same date codes the
+    # simulation used)
+    worst_day_original = np.bincount(date_codes, weights=pnl).min()
+    worst_day_v2 = np.bincount(date_codes, weights=pnl_v2_final).min()
     
     print(f"\nWorst Day Loss:")
     print(f"  Original: {worst_day_original:.2f} points")
@@ -167,65 +162,85 @@ def simulate_v2_performance_on_real_data():
     print(f"  Improvement: {worst_day_v2 - worst_day_original:+.2f} points")
     
     # Save detailed results
-    save_v2_real_data_results(existing_data, v2_simulation, total_pnl_original, total_pnl_v2)
+    stats = {
+        'win_rate_original': win_rate_original, 'win_rate_v2': win_rate_v2,
+        'max_loss_original': max_loss_original, 'max_loss_v2': max_loss_v2,
+        'worst_day_original': worst_day_original, 'worst_day_v2': worst_day_v2,
+    }
+    save_v2_real_data_results(existing_data, v2_simulation, total_pnl_original, total_pnl_v2,
+                              stats, monthly_v2, day_analysis_v2)
     
     return v2_simulation
 
-def save_v2_real_data_results(original_data, v2_data, pnl_original, pnl_v2):
-    """Save detailed V2 real data analysis results"""
+def save_v2_real_data_results(original_data, v2_data, pnl_original, pnl_v2, stats, monthly_v2, day_analysis_v2):
+    """
+    Save detailed V2 real data analysis results. stats holds the win rates,
+    worst trades and worst days simulate_v2_performance_on_real_data already
+    computed; monthly_v2/day_analysis_v2 are its breakdown rows (label -> stats dict).
+    """
     
     # Create results directory if it doesn't exist
     os.makedirs('results', exist_ok=True)
     
-    # Save detailed comparison
+    # Save detailed comparison (position size is final/sized P&L; trades with no
+    # sized P&L divide by 1, i.e. keep their final P&L)
+    v2_sized = v2_data['pnl_v2'].to_numpy()
+    v2_final = v2_data['pnl_v2_final'].to_numpy()
     comparison_data = pd.DataFrame({
         'date': original_data['date'],
         'day_of_week': original_data['day_of_week'],
-        'month': pd.to_datetime(original_data['date']).dt.strftime('%B'),
+        'month': v2_data['month'],
         'original_pnl': original_data['pnl'],
         'v2_pnl': v2_data['pnl_v2_final'],
         'improvement': v2_data['pnl_v2_final'] - original_data['pnl'],
-        'position_size': v2_data['pnl_v2_final'] / v2_data['pnl_v2'].replace(0, 1)
+        'position_size': np.divide(v2_final, v2_sized, out=v2_final.copy(), where=v2_sized != 0)
     })
     
-    comparison_data.to_csv('results/v2_real_data_analysis.csv', index=False)
+    comparison_data.to_csv(V2_CSV, index=False)
+    # Written after the CSV so its mtime marks it current for the readers
+    comparison_data.assign(
+        date=original_data['date_dt'],
+        day_of_week=original_data['day_of_week'].astype(DAY_OF_WEEK_DTYPE),
+    ).to_pickle(V2_CACHE)
+    
+    # Save summary report (stats come from the caller; file written in one go)
+    lines = [
+        "STRATEGY V2 REAL DATA ANALYSIS SUMMARY",
+        "=" * 45,
+        "",
+        "ORIGINAL STRATEGY (REAL DATA):",
+        f"Total P&L: {pnl_original:.2f} points (₹{pnl_original * 15:.2f})",
+        f"Win Rate: {stats['win_rate_original']:.1f}%",
+        f"Worst Trade: {stats['max_loss_original']:.2f} points",
+        f"Worst Day: {stats['worst_day_original']:.2f} points",
+        "",
+        "STRATEGY V2 (REAL DATA):",
+        f"Total P&L: {pnl_v2:.2f} points (₹{pnl_v2 * 15:.2f})",
+        f"Win Rate: {stats['win_rate_v2']:.1f}%",
+        f"Worst Trade: {stats['max_loss_v2']:.2f} points",
+        f"Worst Day: {stats['worst_day_v2']:.2f} points",
+        "",
+        "IMPROVEMENTS:",
+        f"P&L Improvement: {pnl_v2 - pnl_original:+.2f} points (₹{(pnl_v2 - pnl_original) * 15:+.2f})",
+        f"Risk Reduction: {stats['max_loss_v2'] - stats['max_loss_original']:+.2f} points",
+        f"Daily Loss Control: {stats['worst_day_v2'] - stats['worst_day_original']:+.2f} points",
+    ]
     
-    # Save summary report
-    with open('results/v2_real_data_summary.txt', 'w') as f:
-        f.write("STRATEGY V2 REAL DATA ANALYSIS SUMMARY\n")
-        f.write("=" * 45 + "\n\n")
-        
-        f.write("ORIGINAL STRATEGY (REAL DATA):\n")
-        f.write(f"Total P&L: {pnl_original:.2f} points (₹{pnl_original * 15:.2f})\n")
-        f.write(f"Win Rate: {(len(original_data[original_data['pnl'] > 0]) / len(original_data) * 100):.1f}%\n")
-        f.write(f"Worst Trade: {original_data['pnl'].min():.2f} points\n")
-        f.write(f"Worst Day: {original_data.groupby('date')['pnl'].sum().min():.2f} points\n\n")
-        
-        f.write("STRATEGY V2 (REAL DATA):\n")
-        f.write(f"Total P&L: {pnl_v2:.2f} points (₹{pnl_v2 * 15:.2f})\n")
-        f.write(f"Win Rate: {(len(v2_data[v2_data['pnl_v2_final'] > 0]) / len(v2_data) * 100):.1f}%\n")
-        f.write(f"Worst Trade: {v2_data['pnl_v2_final'].min():.2f} points\n")
-        f.write(f"Worst Day: {v2_data.groupby('date')['pnl_v2_final'].sum().min():.2f} points\n\n")
-        
-        f.write("IMPROVEMENTS:\n")
-        f.write(f"P&L Improvement: {pnl_v2 - pnl_original:+.2f} points (₹{(pnl_v2 - pnl_original) * 15:+.2f})\n")
-        f.write(f"Risk Reduction: {v2_data['pnl_v2_final'].min() - original_data['pnl'].min():+.2f} points\n")
-        f.write(f"Daily Loss Control: {v2_data.groupby('date')['pnl_v2_final'].sum().min() - original_data.groupby('date')['pnl'].sum().min():+.2f} points\n")
-        
-        # Monthly breakdown
-        f.write("\nMONTHLY BREAKDOWN (V2):\n")
-        monthly_v2 = v2_data.groupby('month')['pnl_v2_final'].agg(['sum', 'count']).round(2)
-        for month, data in monthly_v2.iterrows():
-            f.write(f"{month}: {data['sum']:>8.2f} points ({data['count']:>2} trades)\n")
-        
-        # Day of week breakdown
-        f.write("\nDAY OF WEEK BREAKDOWN (V2):\n")
-        day_analysis_v2 = v2_data.groupby('day_of_week')['pnl_v2_final'].agg(['sum', 'count', 'mean']).round(2)
-        for day, data in day_analysis_v2.iterrows():
-            f.write(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})\n")
+    # Monthly breakdown
+    lines += ["", "MONTHLY BREAKDOWN (V2):"]
+    for month, data in monthly_v2.items():
+        lines.append(f"{month}: {data['sum']:>8.2f} points ({data['count']:>2} trades)")
+    
+    # Day of week breakdown
+    lines += ["", "DAY OF WEEK BREAKDOWN (V2):"]
+    for day, data in day_analysis_v2.items():
+        lines.append(f"{day}: {data['sum']:>8.2f} points ({data['count']:>2} trades, avg: {data['mean']:>6.2f})")
+    
+    Path('results/v2_real_data_summary.txt').write_text("\n".join(lines) + "\n")
     
     print(f"\n💾 Results saved to:")
-    print(f"   📄 results/v2_real_data_analysis.csv")
+    print(f"   📄 {V2_CSV}")
+    print(f"   📄 {V2_CACHE}")
     print(f"   📄 results/v2_real_data_summary.txt")
 
 def analyze_v2_performance_metrics(v2_data):
@@ -233,9 +248,16 @@ def analyze_v2_performance_metrics(v2_data):
     print(f"\n📊 DETAILED V2 PERFORMANCE METRICS:")
     print("-" * 40)
     
+    # Every metric below works on this one array (no per-trade Python objects);
+    # the win mask is shared by the win stats and the streak count
+    pnl = v2_data['pnl_v2_final'].to_numpy(dtype=np.float64)
+    is_win = pnl > 0
+    wins = pnl[is_win]
+    losses = pnl[pnl < 0]
+    
     # Profit factor
-    winning_trades = v2_data[v2_data['pnl_v2_final'] > 0]['pnl_v2_final'].sum()
-    losing_trades = abs(v2_data[v2_data['pnl_v2_final'] < 0]['pnl_v2_final'].sum())
+    winning_trades = wins.sum()
+    losing_trades = abs(losses.sum())
     profit_factor = winning_trades / losing_trades if losing_trades > 0 else float('inf')
     
     print(f"Profit Factor: {profit_factor:.2f}")
@@ -243,36 +265,27 @@ def analyze_v2_performance_metrics(v2_data):
     print(f"Total Losing Amount: {losing_trades:.2f} points")
     
     # Average trade metrics
-    avg_win = v2_data[v2_data['pnl_v2_final'] > 0]['pnl_v2_final'].mean()
-    avg_loss = v2_data[v2_data['pnl_v2_final'] < 0]['pnl_v2_final'].mean()
+    avg_win = wins.mean() if wins.size else np.nan
+    avg_loss = losses.mean() if losses.size else np.nan
     
     print(f"Average Win: {avg_win:.2f} points")
     print(f"Average Loss: {avg_loss:.2f} points")
     print(f"Win/Loss Ratio: {abs(avg_win/avg_loss):.2f}" if avg_loss != 0 else "Win/Loss Ratio: N/A")
     
-    # Consecutive wins/losses
-    trades = v2_data['pnl_v2_final'].tolist()
-    max_consecutive_wins = 0
-    max_consecutive_losses = 0
-    current_wins = 0
-    current_losses = 0
-    
-    for trade in trades:
-        if trade > 0:
-            current_wins += 1
-            current_losses = 0
-            max_consecutive_wins = max(max_consecutive_wins, current_wins)
-        else:
-            current_losses += 1
-            current_wins = 0
-            max_consecutive_losses = max(max_consecutive_losses, current_losses)
+    # Consecutive wins/losses: split the win/non-win sequence into runs
+    # (a run starts wherever the outcome flips) and take the longest of each
+    run_starts = np.flatnonzero(np.diff(is_win, prepend=~is_win[:1]))
+    run_lengths = np.diff(np.append(run_starts, len(is_win)))
+    run_is_win = is_win[run_starts]
+    max_consecutive_wins = run_lengths[run_is_win].max(initial=0)
+    max_consecutive_losses = run_lengths[~run_is_win].max(initial=0)
     
     print(f"Max Consecutive Wins: {max_consecutive_wins}")
     print(f"Max Consecutive Losses: {max_consecutive_losses}")
     
     # ROI calculation
     total_investment = 100000  # ₹1 lakh
-    total_return = total_investment + (v2_data['pnl_v2_final'].sum() * 15)
+    total_return = total_investment + (pnl.sum() * 15)
     roi = ((total_return - total_investment) / total_investment) * 100
     
     print(f"ROI: {roi:.2f}%")
@@ -1,35 +1,27 @@
-import math
+import numpy as np
 import pandas as pd
 from datetime import time as dtime
 import os
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font
+import contextlib
 
 SQUARE_OFF_TIME = dtime(15, 10)
 
-def _get_buy_value(high_price: float, is_reversal: bool = False) -> float:
-    """Calculate BUY Value: ceil for decimal, direct for whole."""
-    if is_reversal:
-        # For reversals, use the actual high price to ensure trade execution
-        return float(high_price)
-    else:
-        # For normal breakouts, use ceil logic
-        if high_price == int(high_price):  # Already whole number
-            return float(high_price)
-        else:  # Decimal number
-            return float(math.ceil(high_price))
-
-def _get_sell_value(low_price: float, is_reversal: bool = False) -> float:
-    """Calculate SELL Value: floor for decimal, direct for whole."""
-    if is_reversal:
-        # For reversals, use the actual low price to ensure trade execution
-        return float(low_price)
-    else:
-        # For normal breakouts, use floor logic
-        if low_price == int(low_price):  # Already whole number
-            return float(low_price)
-        else:  # Decimal number
-            return float(math.floor(low_price))
+# Per-candle trace output is opt-in: UBLB_DEBUG=1 python run_strategy.py ...
+_DEBUG = os.environ.get("UBLB_DEBUG") == "1"
+
+# Signal column is tracked as small integer codes inside the candle loop and
+# mapped back to these labels once at the end (index == code)
+SIGNAL_NAMES = ("", "Initial", "UBStock", "LBStock", "BUYStock", "SELLStock", "GoingHigh", "GoingDown", "EOD_SQUAREOFF")
+SIG_NONE, SIG_INITIAL, SIG_UBSTOCK, SIG_LBSTOCK, SIG_BUYSTOCK, SIG_SELLSTOCK, SIG_GOINGHIGH, SIG_GOINGDOWN, SIG_EOD_SQUAREOFF = range(len(SIGNAL_NAMES))
+
+# Closed trades are recorded into a preallocated structured buffer during the
+# loop and only turned into the public list of dicts on return
+TRADE_DTYPE = np.dtype([
+    ("entry_idx", "i4"), ("exit_idx", "i4"), ("side", "i1"),
+    ("entry_price", "f8"), ("exit_price", "f8"), ("reason", "i1"), ("pnl", "f8"),
+])
+EXIT_REASONS = ("EOD", "REVERSAL", "DIRECTION_CHANGE_EXIT", "EOD_FINAL")
+EXIT_EOD, EXIT_REVERSAL, EXIT_DIRECTION_CHANGE, EXIT_EOD_FINAL = range(len(EXIT_REASONS))
 
 def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dict]]:
     """
@@ -58,30 +50,71 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
     if df.empty:
         return df.assign(UB=pd.NA, LB=pd.NA, Range=pd.NA, Signal=""), []
 
-    d = df.copy().reset_index(drop=True)
+    # Only new columns are added to d, so the input's data can be shared
+    # (shallow copy) when it already has a 0..n-1 index
+    if df.index.equals(pd.RangeIndex(len(df))):
+        d = df.copy(deep=False)
+    else:
+        d = df.reset_index(drop=True)
     
+    # Raw float64 arrays for the bar-by-bar loop; avoids label lookups per candle
+    times = d["time"].to_numpy(dtype=object)
+    highs = d["high"].to_numpy(dtype=np.float64)
+    lows = d["low"].to_numpy(dtype=np.float64)
+    closes = d["close"].to_numpy(dtype=np.float64)
+
+    # Each candle's bands depend only on its own high/low, so compute them up front
+    range_a = highs - lows
+    ub_a = highs + range_a
+    lb_a = lows - range_a
+
+    # BUY/SELL Values for normal breakouts: ceil/floor of the breakout candle
+    # (whole numbers map to themselves). Reversals trade at the raw high/low.
+    buy_values = np.ceil(highs)
+    sell_values = np.floor(lows)
+
+    # Square-off flag per candle from its wall-clock minute, instead of a
+    # Timestamp -> time conversion and comparison on every iteration
+    if pd.api.types.is_datetime64_any_dtype(d["time"]):
+        minute_of_day = (d["time"].dt.hour * 60 + d["time"].dt.minute).to_numpy(np.int32)
+        square_off = minute_of_day >= SQUARE_OFF_TIME.hour * 60 + SQUARE_OFF_TIME.minute
+    else:
+        square_off = np.array([(x.time() if hasattr(x, "time") else x) >= SQUARE_OFF_TIME for x in times])
+
     # Initialize columns
-    d["Range"] = 0.0
-    d["UB"] = 0.0
-    d["LB"] = 0.0
+    d["Range"] = range_a
+    d["UB"] = ub_a
+    d["LB"] = lb_a
     d["Signal"] = ""
     if "volume" not in d.columns:
         d["volume"] = 0
 
-    trades = []
-    current_trade = None
+    # Signals are filled in place and attached as a column after the loop
+    n = len(d)
+    signal_codes = np.zeros(n, dtype=np.int8)
+
+    # At most one trade closes per candle, plus the final square-off
+    trades_buf = np.empty(n + 1, dtype=TRADE_DTYPE)
+    n_trades = 0
+    # Open position: side is +1 LONG / -1 SHORT / 0 flat
+    pos_side = 0
+    pos_entry_price = 0.0
+    pos_entry_idx = 0
+
+    # The state machine below is scalar code: index plain Python floats from
+    # lists instead of casting numpy scalars with float() on every access
+    highs, lows, closes = highs.tolist(), lows.tolist(), closes.tolist()
+    ub_a, lb_a = ub_a.tolist(), lb_a.tolist()
+    buy_values, sell_values = buy_values.tolist(), sell_values.tolist()
+    square_off = square_off.tolist()
 
     # Step 1: Initial Setup
-    initial_high = float(d.loc[0, "high"])
-    initial_low = float(d.loc[0, "low"])
-    initial_range = initial_high - initial_low
-    initial_ub = initial_high + initial_range
-    initial_lb = initial_low - initial_range
+    initial_high = highs[0]
+    initial_low = lows[0]
+    initial_ub = ub_a[0]
+    initial_lb = lb_a[0]
     
-    d.loc[0, "Range"] = initial_range
-    d.loc[0, "UB"] = initial_ub
-    d.loc[0, "LB"] = initial_lb
-    d.loc[0, "Signal"] = "Initial"
+    signal_codes[0] = SIG_INITIAL
 
     # Tracking variables
     session_highest = initial_high    # Session's highest high for GoingHigh
@@ -89,6 +122,8 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
     current_trend = None              # "UP" or "DOWN"
     current_direction = None          # "UP" or "DOWN" - overall market direction after initial signal
     last_signal_candle_idx = 0        # Last valid signal candle
+    last_ub = initial_ub              # Bands of the last signal candle, for reversals
+    last_lb = initial_lb
     
     # Reference bands (for breakout detection)
     reference_ub = initial_ub
@@ -109,46 +144,34 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
     print(f"Initial Bands: UB={initial_ub:.2f}, LB={initial_lb:.2f}")
 
     # Process each candle
-    for i in range(1, len(d)):
-        current_time = d.loc[i, "time"]
-        t = current_time.time() if hasattr(current_time, "time") else current_time
-        high = float(d.loc[i, "high"])
-        low = float(d.loc[i, "low"])
-        close = float(d.loc[i, "close"])
-        
-        # Calculate current candle's bands
-        current_range = high - low
-        current_ub = high + current_range
-        current_lb = low - current_range
-        
-        d.loc[i, "Range"] = current_range
-        d.loc[i, "UB"] = current_ub
-        d.loc[i, "LB"] = current_lb
-
-        print(f"\n{t} | H:{high:.1f} L:{low:.1f} C:{close:.1f}")
-        print(f"   Session tracking: HighestH={session_highest:.1f} LowestL={session_lowest:.1f}")
-        print(f"   Reference: UB={reference_ub:.1f} LB={reference_lb:.1f}")
-        if buy_value is not None:
-            print(f"   BUY Value: {buy_value:.1f} (waiting: {waiting_for_buystock})")
-        if sell_value is not None:
-            print(f"   SELL Value: {sell_value:.1f} (waiting: {waiting_for_sellstock})")
+    for i in range(1, n):
+        high = highs[i]
+        low = lows[i]
+        close = closes[i]
+        current_ub = ub_a[i]
+        current_lb = lb_a[i]
+
+        if _DEBUG:
+            current_time = times[i]
+            t = current_time.time() if hasattr(current_time, "time") else current_time
+            print(f"\n{t} | H:{high:.1f} L:{low:.1f} C:{close:.1f}")
+            print(f"   Session tracking: HighestH={session_highest:.1f} LowestL={session_lowest:.1f}")
+            print(f"   Reference: UB={reference_ub:.1f} LB={reference_lb:.1f}")
+            if buy_value is not None:
+                print(f"   BUY Value: {buy_value:.1f} (waiting: {waiting_for_buystock})")
+            if sell_value is not None:
+                print(f"   SELL Value: {sell_value:.1f} (waiting: {waiting_for_sellstock})")
 
         # EOD Square-off
-        if t >= SQUARE_OFF_TIME and current_trade:
+        if square_off[i] and pos_side != 0:
             exit_price = close
-            pnl = (exit_price - current_trade["entry_price"]) if current_trade["side"] == "LONG" else (current_trade["entry_price"] - exit_price)
-            trades.append({
-                "entry_time": current_trade["entry_time"],
-                "side": current_trade["side"], 
-                "entry_price": current_trade["entry_price"],
-                "exit_time": current_time,
-                "exit_price": exit_price,
-                "reason": "EOD",
-                "pnl": pnl
-            })
-            current_trade = None
-            d.loc[i, "Signal"] = "EOD_SQUAREOFF"
-            print(f"EOD Square-off @ {exit_price} | P&L: {pnl:+.2f}")
+            pnl = (exit_price - pos_entry_price) if pos_side == 1 else (pos_entry_price - exit_price)
+            trades_buf[n_trades] = (pos_entry_idx, i, pos_side, pos_entry_price, exit_price, EXIT_EOD, pnl)
+            n_trades += 1
+            pos_side = 0
+            signal_codes[i] = SIG_EOD_SQUAREOFF
+            if _DEBUG:
+                print(f"EOD Square-off @ {exit_price} | P&L: {pnl:+.2f}")
             continue
 
         signal_assigned = False
@@ -157,74 +180,74 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
         # Only trigger if no LONG trade is currently open AND we're in DOWN direction
         if not ubstock_breakout_occurred and high > reference_ub and not signal_assigned:
             # Check if we already have a LONG position
-            if current_trade and current_trade["side"] == "LONG":
+            if pos_side == 1:
                 # Already have LONG position - no new breakout needed
-                print(f"   UBStock: {high:.2f} > {reference_ub:.2f} (IGNORED - LONG already open)")
+                if _DEBUG:
+                    print(f"   UBStock: {high:.2f} > {reference_ub:.2f} (IGNORED - LONG already open)")
             # Check if we're in UP direction - only allow UBStock if we're in DOWN direction
             elif current_direction == "UP":
-                print(f"   UBStock: {high:.2f} > {reference_ub:.2f} (IGNORED - UP direction, wait for LB breakdown)")
+                if _DEBUG:
+                    print(f"   UBStock: {high:.2f} > {reference_ub:.2f} (IGNORED - UP direction, wait for LB breakdown)")
             else:
                 # No LONG position and in DOWN direction - trigger breakout
-                d.loc[i, "Signal"] = "UBStock"
+                signal_codes[i] = SIG_UBSTOCK
                 ubstock_breakout_occurred = True
                 
-                buy_value = _get_buy_value(high)
+                buy_value = buy_values[i]
                 waiting_for_buystock = True
                 
                 signal_assigned = True
-                print(f"   UBStock: {high:.2f} > {reference_ub:.2f}")
-                print(f"   BUY Value: {buy_value:.2f}")
+                if _DEBUG:
+                    print(f"   UBStock: {high:.2f} > {reference_ub:.2f}")
+                    print(f"   BUY Value: {buy_value:.2f}")
 
         # STEP 2B: LBStock (First breakout below reference LB)
         # Only trigger if no SHORT trade is currently open AND we're in UP direction
         if not lbstock_breakout_occurred and low < reference_lb and not signal_assigned:
             # Check if we already have a SHORT position
-            if current_trade and current_trade["side"] == "SHORT":
+            if pos_side == -1:
                 # Already have SHORT position - no new breakout needed
-                print(f"   LBStock: {low:.2f} < {reference_lb:.2f} (IGNORED - SHORT already open)")
+                if _DEBUG:
+                    print(f"   LBStock: {low:.2f} < {reference_lb:.2f} (IGNORED - SHORT already open)")
             # Check if we're in DOWN direction - only allow LBStock if we're in UP direction
             elif current_direction == "DOWN":
-                print(f"   LBStock: {low:.2f} < {reference_lb:.2f} (IGNORED - DOWN direction, wait for UB breakout)")
+                if _DEBUG:
+                    print(f"   LBStock: {low:.2f} < {reference_lb:.2f} (IGNORED - DOWN direction, wait for UB breakout)")
             else:
                 # No SHORT position and in UP direction - trigger breakout
-                d.loc[i, "Signal"] = "LBStock"
+                signal_codes[i] = SIG_LBSTOCK
                 lbstock_breakout_occurred = True
                 
-                sell_value = _get_sell_value(low)
+                sell_value = sell_values[i]
                 waiting_for_sellstock = True
                 
                 signal_assigned = True
-                print(f"   LBStock: {low:.2f} < {reference_lb:.2f}")
-                print(f"   SELL Value: {sell_value:.2f}")
+                if _DEBUG:
+                    print(f"   LBStock: {low:.2f} < {reference_lb:.2f}")
+                    print(f"   SELL Value: {sell_value:.2f}")
 
         # STEP 3A: BUYStock (High >= BUY Value) - HIGHEST PRIORITY
         if waiting_for_buystock and buy_value is not None and high >= buy_value and not signal_assigned:
             entry_price = buy_value
-            d.loc[i, "Signal"] = "BUYStock"
+            signal_codes[i] = SIG_BUYSTOCK
             
             # Close existing short
-            if current_trade and current_trade["side"] == "SHORT":
-                pnl = current_trade["entry_price"] - entry_price
-                trades.append({
-                    "entry_time": current_trade["entry_time"],
-                    "side": current_trade["side"],
-                    "entry_price": current_trade["entry_price"],
-                    "exit_time": current_time,
-                    "exit_price": entry_price,
-                    "reason": "REVERSAL",
-                    "pnl": pnl
-                })
-                print(f"     Closed SHORT @ {entry_price} | P&L: {pnl:+.2f}")
+            if pos_side == -1:
+                pnl = pos_entry_price - entry_price
+                trades_buf[n_trades] = (pos_entry_idx, i, -1, pos_entry_price, entry_price, EXIT_REVERSAL, pnl)
+                n_trades += 1
+                if _DEBUG:
+                    print(f"     Closed SHORT @ {entry_price} | P&L: {pnl:+.2f}")
             
             # Open new long
-            current_trade = {
-                "entry_time": current_time,
-                "side": "LONG",
-                "entry_price": entry_price
-            }
+            pos_side = 1
+            pos_entry_price = entry_price
+            pos_entry_idx = i
             
             current_trend = "UP"
             last_signal_candle_idx = i
+            last_ub = current_ub
+            last_lb = current_lb
             waiting_for_buystock = False  # CRITICAL: Reset waiting flag
             
             # Reset breakout flags to allow new breakouts in same direction
@@ -237,36 +260,31 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
             session_lowest = low
             
             signal_assigned = True
-            print(f"   BUYStock LONG @ {entry_price} | Trend: UP")
+            if _DEBUG:
+                print(f"   BUYStock LONG @ {entry_price} | Trend: UP")
 
         # STEP 3B: SELLStock (Low <= SELL Value) - HIGHEST PRIORITY
         if waiting_for_sellstock and sell_value is not None and low <= sell_value and not signal_assigned:
             entry_price = sell_value
-            d.loc[i, "Signal"] = "SELLStock"
+            signal_codes[i] = SIG_SELLSTOCK
             
             # Close existing long
-            if current_trade and current_trade["side"] == "LONG":
-                pnl = entry_price - current_trade["entry_price"]
-                trades.append({
-                    "entry_time": current_trade["entry_time"],
-                    "side": current_trade["side"],
-                    "entry_price": current_trade["entry_price"],
-                    "exit_time": current_time,
-                    "exit_price": entry_price,
-                    "reason": "REVERSAL",
-                    "pnl": pnl
-                })
-                print(f"     Closed LONG @ {entry_price} | P&L: {pnl:+.2f}")
+            if pos_side == 1:
+                pnl = entry_price - pos_entry_price
+                trades_buf[n_trades] = (pos_entry_idx, i, 1, pos_entry_price, entry_price, EXIT_REVERSAL, pnl)
+                n_trades += 1
+                if _DEBUG:
+                    print(f"     Closed LONG @ {entry_price} | P&L: {pnl:+.2f}")
             
             # Open new short
-            current_trade = {
-                "entry_time": current_time,
-                "side": "SHORT",
-                "entry_price": entry_price
-            }
+            pos_side = -1
+            pos_entry_price = entry_price
+            pos_entry_idx = i
             
             current_trend = "DOWN"
             last_signal_candle_idx = i
+            last_ub = current_ub
+            last_lb = current_lb
             waiting_for_sellstock = False  # CRITICAL: Reset waiting flag
             
             # Reset breakout flags to allow new breakouts in same direction
@@ -279,43 +297,31 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
             session_lowest = low
             
             signal_assigned = True
-            print(f"   SELLStock SHORT @ {entry_price} | Trend: DOWN")
+            if _DEBUG:
+                print(f"   SELLStock SHORT @ {entry_price} | Trend: DOWN")
 
         # STEP 5: Direction Change Reversals
         if not signal_assigned and current_trend and last_signal_candle_idx < i:
-            last_high = d.loc[last_signal_candle_idx, "high"]
-            last_low = d.loc[last_signal_candle_idx, "low"]
-            last_range = last_high - last_low
-            last_ub = last_high + last_range
-            last_lb = last_low - last_range
-            
             # UP trend reversal
             if current_trend == "UP" and low < last_lb:
-                reversal_sell_value = _get_sell_value(low, is_reversal=True)
+                reversal_sell_value = low
                 
                 # Exit long first
-                if current_trade and current_trade["side"] == "LONG":
-                    pnl = close - current_trade["entry_price"]
-                    trades.append({
-                        "entry_time": current_trade["entry_time"],
-                        "side": current_trade["side"],
-                        "entry_price": current_trade["entry_price"],
-                        "exit_time": current_time,
-                        "exit_price": close,
-                        "reason": "DIRECTION_CHANGE_EXIT",
-                        "pnl": pnl
-                    })
-                    print(f"     Closed LONG @ {close} | P&L: {pnl:+.2f}")
-                    current_trade = None
+                if pos_side == 1:
+                    pnl = close - pos_entry_price
+                    trades_buf[n_trades] = (pos_entry_idx, i, 1, pos_entry_price, close, EXIT_DIRECTION_CHANGE, pnl)
+                    n_trades += 1
+                    if _DEBUG:
+                        print(f"     Closed LONG @ {close} | P&L: {pnl:+.2f}")
+                    pos_side = 0
                 
                 # IMMEDIATE EXECUTION: Execute the reversal trade immediately
-                current_trade = {
-                    "entry_time": current_time,
-                    "side": "SHORT",
-                    "entry_price": reversal_sell_value
-                }
-                d.loc[i, "Signal"] = "SELLStock"
-                print(f"   SELLStock SHORT @ {reversal_sell_value:.2f} | Trend: DOWN")
+                pos_side = -1
+                pos_entry_price = reversal_sell_value
+                pos_entry_idx = i
+                signal_codes[i] = SIG_SELLSTOCK
+                if _DEBUG:
+                    print(f"   SELLStock SHORT @ {reversal_sell_value:.2f} | Trend: DOWN")
                 
                 # Reset waiting flags since trade is executed
                 sell_value = None
@@ -336,35 +342,31 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
                 waiting_for_buystock = False
                 
                 signal_assigned = True
-                print(f"   Direction Change: Low {low:.2f} < last LB {last_lb:.2f}")
+                if _DEBUG:
+                    print(f"   Direction Change: Low {low:.2f} < last LB {last_lb:.2f}")
+                last_ub = current_ub
+                last_lb = current_lb
                 
             # DOWN trend reversal
             elif current_trend == "DOWN" and high > last_ub:
-                reversal_buy_value = _get_buy_value(high, is_reversal=True)
+                reversal_buy_value = high
                 
                 # Exit short first
-                if current_trade and current_trade["side"] == "SHORT":
-                    pnl = current_trade["entry_price"] - close
-                    trades.append({
-                        "entry_time": current_trade["entry_time"],
-                        "side": current_trade["side"],
-                        "entry_price": current_trade["entry_price"],
-                        "exit_time": current_time,
-                        "exit_price": close,
-                        "reason": "DIRECTION_CHANGE_EXIT",
-                        "pnl": pnl
-                    })
-                    print(f"     Closed SHORT @ {close} | P&L: {pnl:+.2f}")
-                    current_trade = None
+                if pos_side == -1:
+                    pnl = pos_entry_price - close
+                    trades_buf[n_trades] = (pos_entry_idx, i, -1, pos_entry_price, close, EXIT_DIRECTION_CHANGE, pnl)
+                    n_trades += 1
+                    if _DEBUG:
+                        print(f"     Closed SHORT @ {close} | P&L: {pnl:+.2f}")
+                    pos_side = 0
                 
                 # IMMEDIATE EXECUTION: Execute the reversal trade immediately
-                current_trade = {
-                    "entry_time": current_time,
-                    "side": "LONG",
-                    "entry_price": reversal_buy_value
-                }
-                d.loc[i, "Signal"] = "BUYStock"
-                print(f"   BUYStock LONG @ {reversal_buy_value:.2f} | Trend: UP")
+                pos_side = 1
+                pos_entry_price = reversal_buy_value
+                pos_entry_idx = i
+                signal_codes[i] = SIG_BUYSTOCK
+                if _DEBUG:
+                    print(f"   BUYStock LONG @ {reversal_buy_value:.2f} | Trend: UP")
                 
                 # Reset waiting flags since trade is executed
                 buy_value = None
@@ -385,7 +387,10 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
                 waiting_for_sellstock = False
                 
                 signal_assigned = True
-                print(f"   Direction Change: High {high:.2f} > last UB {last_ub:.2f}")
+                if _DEBUG:
+                    print(f"   Direction Change: High {high:.2f} > last UB {last_ub:.2f}")
+                last_ub = current_ub
+                last_lb = current_lb
 
         # STEP 4: Direction Change Detection (Higher Priority than Momentum)
         # Check if price has broken the opposite direction's reference band
@@ -393,7 +398,8 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
             if current_direction == "UP" and low < reference_lb:
                 # UP direction broken - change to DOWN
                 current_direction = "DOWN"
-                print(f"   Direction Change: UP → DOWN (Low {low:.2f} < LB {reference_lb:.2f})")
+                if _DEBUG:
+                    print(f"   Direction Change: UP → DOWN (Low {low:.2f} < LB {reference_lb:.2f})")
                 # Reset breakout flags to allow new breakouts in opposite direction
                 ubstock_breakout_occurred = False
                 lbstock_breakout_occurred = False
@@ -401,7 +407,8 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
             elif current_direction == "DOWN" and high > reference_ub:
                 # DOWN direction broken - change to UP
                 current_direction = "UP"
-                print(f"   Direction Change: DOWN → UP (High {high:.2f} > UB {reference_ub:.2f})")
+                if _DEBUG:
+                    print(f"   Direction Change: DOWN → UP (High {high:.2f} > UB {reference_ub:.2f})")
                 # Reset breakout flags to allow new breakouts in opposite direction
                 ubstock_breakout_occurred = False
                 lbstock_breakout_occurred = False
@@ -412,14 +419,15 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
         if not signal_assigned:
             # STEP 5A: GoingHigh Detection - Only in UP direction or when direction not set
             if (current_direction is None or current_direction == "UP") and high > session_highest:
-                d.loc[i, "Signal"] = "GoingHigh"
+                signal_codes[i] = SIG_GOINGHIGH
                 session_highest = high  # Update session tracking
                 session_lowest = low    # Reset session_lowest to current candle for future GoingDown detection
                 
                 # Set market direction to UP if this is the first momentum signal
                 if current_direction is None:
                     current_direction = "UP"
-                    print(f"   Market Direction Set: UP")
+                    if _DEBUG:
+                        print(f"   Market Direction Set: UP")
                 # Don't change direction if already set - only continue in current direction
                 
                 # Update reference bands to this GoingHigh candle
@@ -427,6 +435,8 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
                 reference_lb = current_lb
                 reference_candle_idx = i
                 last_signal_candle_idx = i
+                last_ub = current_ub
+                last_lb = current_lb
                 
                 # Reset for new reference
                 ubstock_breakout_occurred = False
@@ -435,22 +445,25 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
                 sell_value = None
                 
                 signal_assigned = True
-                print(f"   GoingHigh: {high:.2f} > {session_highest - (high - session_highest):.2f} (previous highest)")
-                print(f"   Updated Reference: UB={reference_ub:.2f}, LB={reference_lb:.2f}")
+                if _DEBUG:
+                    print(f"   GoingHigh: {high:.2f} > {session_highest - (high - session_highest):.2f} (previous highest)")
+                    print(f"   Updated Reference: UB={reference_ub:.2f}, LB={reference_lb:.2f}")
             # Ignore GoingHigh if in DOWN direction
             elif current_direction == "DOWN" and high > session_highest:
-                print(f"   GoingHigh IGNORED (direction DOWN, wait for direction change)")
+                if _DEBUG:
+                    print(f"   GoingHigh IGNORED (direction DOWN, wait for direction change)")
 
             # STEP 5B: GoingDown Detection - Only in DOWN direction or when direction not set
             elif (current_direction is None or current_direction == "DOWN") and low < session_lowest:
-                d.loc[i, "Signal"] = "GoingDown"
+                signal_codes[i] = SIG_GOINGDOWN
                 session_lowest = low   # Update session tracking
                 session_highest = high # Reset session_highest to current candle for future GoingHigh detection
                 
                 # Set market direction to DOWN if this is the first momentum signal
                 if current_direction is None:
                     current_direction = "DOWN"
-                    print(f"   Market Direction Set: DOWN")
+                    if _DEBUG:
+                        print(f"   Market Direction Set: DOWN")
                 # Don't change direction if already set - only continue in current direction
                 
                 # Update reference bands to this GoingDown candle
@@ -458,6 +471,8 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
                 reference_lb = current_lb
                 reference_candle_idx = i
                 last_signal_candle_idx = i
+                last_ub = current_ub
+                last_lb = current_lb
                 
                 # Reset for new reference
                 ubstock_breakout_occurred = False
@@ -466,37 +481,53 @@ def run_floating_band_strategy(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dic
                 sell_value = None
                 
                 signal_assigned = True
-                print(f"   GoingDown: {low:.2f} < {session_lowest + (session_lowest - low):.2f} (previous lowest)")
-                print(f"   Updated Reference: UB={reference_ub:.2f}, LB={reference_lb:.2f}")
+                if _DEBUG:
+                    print(f"   GoingDown: {low:.2f} < {session_lowest + (session_lowest - low):.2f} (previous lowest)")
+                    print(f"   Updated Reference: UB={reference_ub:.2f}, LB={reference_lb:.2f}")
             # Ignore GoingDown if in UP direction
             elif current_direction == "UP" and low < session_lowest:
-                print(f"   GoingDown IGNORED (direction UP, wait for direction change)")
+                if _DEBUG:
+                    print(f"   GoingDown IGNORED (direction UP, wait for direction change)")
 
         # ALWAYS update session tracking (even when no signal is assigned)
-        if high > session_highest:
-            session_highest = high
-        if low < session_lowest:
-            session_lowest = low
+        session_highest = max(session_highest, high)
+        session_lowest = min(session_lowest, low)
 
         if not signal_assigned:
-            print(f"   No signal")
+            if _DEBUG:
+                print(f"   No signal")
+
+    d["Signal"] = [SIGNAL_NAMES[c] for c in signal_codes.tolist()]
 
     # Final square-off
-    if current_trade:
-        final_price = d.loc[len(d)-1, "close"]
-        pnl = (final_price - current_trade["entry_price"]) if current_trade["side"] == "LONG" else (current_trade["entry_price"] - final_price)
-        trades.append({
-            "entry_time": current_trade["entry_time"],
-            "side": current_trade["side"],
-            "entry_price": current_trade["entry_price"],
-            "exit_time": d.loc[len(d)-1, "time"],
-            "exit_price": final_price,
-            "reason": "EOD_FINAL",
-            "pnl": pnl
-        })
+    if pos_side != 0:
+        final_price = closes[-1]
+        pnl = (final_price - pos_entry_price) if pos_side == 1 else (pos_entry_price - final_price)
+        trades_buf[n_trades] = (pos_entry_idx, n - 1, pos_side, pos_entry_price, final_price, EXIT_EOD_FINAL, pnl)
+        n_trades += 1
         print(f"\nFinal Square-off @ {final_price} | P&L: {pnl:+.2f}")
 
-    return d, trades
+    return d, _trades_to_dicts(trades_buf[:n_trades], times)
+
+def _trades_to_dicts(trades_buf: np.ndarray, times: np.ndarray) -> list[dict]:
+    """Expand the structured trade buffer into the public list-of-dict trade log."""
+    return [
+        {
+            "entry_time": times[entry_idx],
+            "side": "LONG" if side == 1 else "SHORT",
+            "entry_price": entry_price,
+            "exit_time": times[exit_idx],
+            "exit_price": exit_price,
+            "reason": EXIT_REASONS[reason],
+            "pnl": pnl
+        }
+        for entry_idx, exit_idx, side, entry_price, exit_price, reason, pnl in trades_buf.tolist()
+    ]
+
+def run_floating_band_strategy_quiet(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dict]]:
+    """run_floating_band_strategy with its console output muted (for batch/worker use)."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return run_floating_band_strategy(df)
 
 def save_strategy_report(annotated_df, trades, date_str):
     """Save strategy results to Excel and CSV files."""
@@ -509,10 +540,10 @@ def save_strategy_report(annotated_df, trades, date_str):
 
     required_cols = ["time", "volume", "Range", "high", "low", "UB", "LB", "Signal"]
     
+    # Select just the report columns (rename below already returns a new frame)
+    output_df = annotated_df.reindex(columns=required_cols)
     if "volume" not in annotated_df.columns:
-        annotated_df["volume"] = 0
-    
-    output_df = annotated_df[required_cols].copy()
+        output_df["volume"] = 0
     # Fix column names to match requirements: Time | Volume | Range | High | Low | UB | LB | Signal
     output_df = output_df.rename(columns={
         "time": "Time", 
@@ -523,7 +554,11 @@ def save_strategy_report(annotated_df, trades, date_str):
     
     if "Time" in output_df.columns:
         try:
-            output_df["Time"] = pd.to_datetime(output_df["Time"]).dt.strftime("%H:%M")
+            times = output_df["Time"]
+            # Strategy output already carries datetime64 times; only parse anything else
+            if not pd.api.types.is_datetime64_any_dtype(times):
+                times = pd.to_datetime(times)
+            output_df["Time"] = times.dt.strftime("%H:%M")
         except:
             output_df["Time"] = output_df["Time"].astype(str).str[:5]
     
@@ -533,9 +568,15 @@ def save_strategy_report(annotated_df, trades, date_str):
             output_df[col] = output_df[col].round(2)
     
     try:
-        output_df.to_excel(xlsx_file, index=False)
+        # Style the sheet in memory before the single save rather than
+        # writing, reloading and re-saving the workbook
+        with pd.ExcelWriter(xlsx_file, engine="openpyxl") as writer:
+            output_df.to_excel(writer, index=False)
+            try:
+                _style_signal_cells(writer.sheets["Sheet1"])
+            except Exception as e:
+                print(f"Warning: Could not apply Excel formatting - {e}")
         output_df.to_csv(csv_file, index=False)
-        apply_excel_formatting(xlsx_file)
         
         print(f"\nReports saved:")
         print(f"   Excel: {xlsx_file}")
@@ -545,46 +586,61 @@ def save_strategy_report(annotated_df, trades, date_str):
         print(f"Warning: Could not save reports - {e}")
 
 def apply_excel_formatting(xlsx_path):
-    """Apply color coding to Excel file."""
+    """Apply color coding to an existing Excel report."""
+    # openpyxl is only needed here; keeping it off the module import path spares
+    # strategy-only callers (e.g. batch worker processes) ~150 ms each
+    from openpyxl import load_workbook
+    
     try:
         wb = load_workbook(xlsx_path)
-        ws = wb.active
-
-        header_row = {cell.value: cell.column for cell in ws[1]}
-        signal_col = header_row.get("Signal")
-        high_col = header_row.get("High")
-        low_col = header_row.get("Low")
-
-        if not (signal_col and high_col and low_col):
-            return
-
-        light_green = PatternFill(start_color="FFC6EFCE", end_color="FFC6EFCE", fill_type="solid")
-        light_red = PatternFill(start_color="FFFFC7CE", end_color="FFFFC7CE", fill_type="solid")
-        dark_green = PatternFill(start_color="FF006400", end_color="FF006400", fill_type="solid")
-        dark_red = PatternFill(start_color="FF8B0000", end_color="FF8B0000", fill_type="solid")
-        white_font = Font(color="FFFFFFFF", bold=True)
-
-        for row in range(2, ws.max_row + 1):
-            signal = ws.cell(row=row, column=signal_col).value
-            
-            if signal in ["UBStock", "GoingHigh"]:
-                ws.cell(row=row, column=high_col).fill = light_green
-            elif signal in ["LBStock", "GoingDown"]:
-                ws.cell(row=row, column=low_col).fill = light_red
-            elif signal in ["BUYStock", "BUY"]:
-                high_cell = ws.cell(row=row, column=high_col)
-                high_cell.fill = dark_green
-                high_cell.font = white_font
-            elif signal in ["SELLStock", "SELL"]:
-                low_cell = ws.cell(row=row, column=low_col)
-                low_cell.fill = dark_red
-                low_cell.font = white_font
-
+        _style_signal_cells(wb.active)
         wb.save(xlsx_path)
         
     except Exception as e:
         print(f"Warning: Could not apply Excel formatting - {e}")
 
+def _style_signal_cells(ws):
+    """Color the High/Low cells of signal rows on an openpyxl worksheet."""
+    from openpyxl.styles import PatternFill, Font
+
+    header_row = {cell.value: cell.column for cell in ws[1]}
+    signal_col = header_row.get("Signal")
+    high_col = header_row.get("High")
+    low_col = header_row.get("Low")
+
+    if not (signal_col and high_col and low_col):
+        return
+
+    light_green = PatternFill(start_color="FFC6EFCE", end_color="FFC6EFCE", fill_type="solid")
+    light_red = PatternFill(start_color="FFFFC7CE", end_color="FFFFC7CE", fill_type="solid")
+    dark_green = PatternFill(start_color="FF006400", end_color="FF006400", fill_type="solid")
+    dark_red = PatternFill(start_color="FF8B0000", end_color="FF8B0000", fill_type="solid")
+    white_font = Font(color="FFFFFFFF", bold=True)
+
+    # Signal -> (fill, font, column to style); font None keeps the default
+    signal_styles = {
+        "UBStock": (light_green, None, high_col),
+        "GoingHigh": (light_green, None, high_col),
+        "LBStock": (light_red, None, low_col),
+        "GoingDown": (light_red, None, low_col),
+        "BUYStock": (dark_green, white_font, high_col),
+        "BUY": (dark_green, white_font, high_col),
+        "SELLStock": (dark_red, white_font, low_col),
+        "SELL": (dark_red, white_font, low_col),
+    }
+
+    # One pass over just the columns involved instead of ws.cell lookups per row
+    min_col = min(signal_col, high_col, low_col)
+    max_col = max(signal_col, high_col, low_col)
+    for row in ws.iter_rows(min_row=2, min_col=min_col, max_col=max_col):
+        style = signal_styles.get(row[signal_col - min_col].value)
+        if style:
+            fill, font, col = style
+            cell = row[col - min_col]
+            cell.fill = fill
+            if font:
+                cell.font = font
+
 def print_strategy_summary(trades, date_str):
     """Print strategy performance summary."""
     print(f"\nStrategy Performance Summary for {date_str}")
@@ -594,17 +650,18 @@ def print_strategy_summary(trades, date_str):
         print("Result: No trades executed")
         return
         
-    total_pnl = sum(t['pnl'] for t in trades)
-    winning_trades = [t for t in trades if t['pnl'] > 0]
-    losing_trades = [t for t in trades if t['pnl'] <= 0]
+    pnl = np.fromiter((t['pnl'] for t in trades), dtype=np.float64, count=len(trades))
+    total_pnl = pnl.sum()
+    winning_trades = np.count_nonzero(pnl > 0)
+    losing_trades = np.count_nonzero(pnl <= 0)
     
-    win_rate = (len(winning_trades) / len(trades)) * 100 if trades else 0
-    max_profit = max([t['pnl'] for t in trades]) if trades else 0
-    max_loss = min([t['pnl'] for t in trades]) if trades else 0
+    win_rate = (winning_trades / len(trades)) * 100
+    max_profit = pnl.max()
+    max_loss = pnl.min()
     
     print(f"Total Trades: {len(trades)}")
     print(f"Total P&L: {total_pnl:+.2f}")
-    print(f"Win Rate: {win_rate:.1f}% ({len(winning_trades)}W / {len(losing_trades)}L)")
+    print(f"Win Rate: {win_rate:.1f}% ({winning_trades}W / {losing_trades}L)")
     if max_profit > 0:
         print(f"Best Trade: {max_profit:+.2f}")
     if max_loss < 0:
@@ -31,7 +31,13 @@ def fetch_5min_data(kite: KiteConnect, instrument_token: int, date_str: str = No
     if not candles:
         return pd.DataFrame(columns=["time","open","high","low","close","volume"])
 
-    df = pd.DataFrame(candles)
-    df.rename(columns={"date": "time"}, inplace=True)
-    df["time"] = pd.to_datetime(df["time"])
-    return df[["time","open","high","low","close","volume"]]
+    # Build column-wise: skips pandas' per-row key inference on the list of
+    # dicts and the final column-subset copy
+    return pd.DataFrame({
+        "time": pd.to_datetime([c["date"] for c in candles]),
+        "open": [c["open"] for c in candles],
+        "high": [c["high"] for c in candles],
+        "low": [c["low"] for c in candles],
+        "close": [c["close"] for c in candles],
+        "volume": [c["volume"] for c in candles],
+    })
@@ -1,61 +1,79 @@
-import io
 import os
 import requests
+from functools import lru_cache
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from config.settings import RAW_DATA_DIR
 
 KITE_INSTRUMENTS_URL = "https://api.kite.trade/instruments"
+INSTRUMENTS_CACHE = RAW_DATA_DIR / "instruments.pkl"
+IST = ZoneInfo("Asia/Kolkata")
+
+# Only the columns the token lookups read; the rest of the dump is skipped at parse time
+INSTRUMENT_COLUMNS = ["instrument_token", "name", "expiry", "segment"]
+INSTRUMENT_DTYPES = {"instrument_token": "int64", "name": "category", "segment": "category"}
 
 def download_instruments_csv() -> pd.DataFrame:
     # Zerodha instruments dump (CSV). Public.
     headers = {"X-Kite-Version": "3"}
-    resp = requests.get(KITE_INSTRUMENTS_URL, headers=headers, timeout=30)
-    resp.raise_for_status()
-    return pd.read_csv(io.StringIO(resp.text))
+    # Parse straight off the socket instead of decoding the whole body into a str first
+    with requests.get(KITE_INSTRUMENTS_URL, headers=headers, timeout=30, stream=True) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True  # undo gzip transfer encoding
+        return pd.read_csv(resp.raw, usecols=INSTRUMENT_COLUMNS, dtype=INSTRUMENT_DTYPES,
+                           parse_dates=["expiry"])
+
+def _last_dump_refresh() -> float:
+    """Epoch time of the most recent 09:00 IST (Kite regenerates the dump before open)."""
+    now = datetime.now(IST)
+    refresh = now.replace(hour=9, minute=0, second=0, microsecond=0)
+    if now < refresh:
+        refresh -= timedelta(days=1)
+    return refresh.timestamp()
+
+def get_instruments_cached() -> pd.DataFrame:
+    """
+    Instruments dump, downloaded at most once per trading day and kept on disk.
+    Within a process the loaded frame is reused too; treat it as read-only.
+    """
+    return _load_instruments(_last_dump_refresh())
+
+@lru_cache(maxsize=1)
+def _load_instruments(refresh: float) -> pd.DataFrame:
+    """Load the dump for the trading day starting at `refresh` (disk cache, else Kite)."""
+    try:
+        if INSTRUMENTS_CACHE.stat().st_mtime >= refresh:
+            return pd.read_pickle(INSTRUMENTS_CACHE)
+    except FileNotFoundError:
+        pass
+    
+    df = download_instruments_csv()
+    INSTRUMENTS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    df.to_pickle(INSTRUMENTS_CACHE)
+    return df
+
+def _banknifty_future_expiries(df: pd.DataFrame) -> pd.Series:
+    """Expiry dates of BANKNIFTY futures expiring today or later, indexed like df."""
+    bn = df[(df["name"] == "BANKNIFTY") & (df["segment"] == "NFO-FUT")]
+    expiry = pd.to_datetime(bn["expiry"], errors="coerce")
+    return expiry[expiry >= pd.Timestamp(datetime.now().date())]
 
 def get_banknifty_current_month_fut_token(df: pd.DataFrame) -> int | None:
-    # Filter current-month BANKNIFTY futures (FUT)
-    now = datetime.now()
     # Zerodha uses actual expiry date; pick nearest future expiry for BANKNIFTY
-    bn = df[(df["name"] == "BANKNIFTY") & (df["segment"] == "NFO-FUT")]
-    if bn.empty:
+    expiry = _banknifty_future_expiries(df)
+    if expiry.empty:
         return None
-    # Choose the nearest expiry in the future
-    bn = bn.copy()
-    bn["expiry"] = pd.to_datetime(bn["expiry"], errors="coerce")
-    bn = bn[bn["expiry"] >= pd.Timestamp(now.date())]
-    if bn.empty:
-        return None
-    bn = bn.sort_values("expiry", ascending=True).iloc[0]
-    return int(bn["instrument_token"])
+    return int(df.at[expiry.idxmin(), "instrument_token"])
 
 def get_banknifty_weekly_fut_token(df: pd.DataFrame) -> int | None:
     """Get the nearest weekly BANKNIFTY futures contract token"""
-    now = datetime.now()
-    
-    # Filter BANKNIFTY futures
-    bn = df[(df["name"] == "BANKNIFTY") & (df["segment"] == "NFO-FUT")].copy()
-    if bn.empty:
-        return None
-    
-    # Convert expiry to datetime
-    bn["expiry"] = pd.to_datetime(bn["expiry"], errors="coerce")
-    
-    # Filter for future expiries only
-    bn = bn[bn["expiry"] >= pd.Timestamp(now.date())]
-    if bn.empty:
-        return None
-    
-    # Weekly contracts typically expire on Thursdays
-    # Sort by expiry and get the nearest one (which is usually weekly)
-    bn = bn.sort_values("expiry", ascending=True)
-    
-    # Get the nearest expiry (weekly contracts are closest)
-    nearest_contract = bn.iloc[0]
-    
-    return int(nearest_contract["instrument_token"])
+    # Weekly contracts typically expire on Thursdays, so the nearest
+    # future expiry is usually the weekly one
+    return get_banknifty_current_month_fut_token(df)
 
 def get_banknifty_token():
     """Convenience function to get weekly BankNifty futures token"""
-    df = download_instruments_csv()
+    df = get_instruments_cached()
     return get_banknifty_weekly_fut_token(df)